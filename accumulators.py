@@ -0,0 +1,214 @@
+import numpy as np
+
+# Online run statistics in O(1) memory per tick. A MetricSet is a run() callback:
+#   metrics = MetricSet(Welford(), MinMax(['A', 'B']), Autocorrelation(lags=(1, 10)))
+#   engine.run(steps, record=[], callback=metrics)
+#   metrics.report()
+# Each accumulator watches a subset of symbols (None = all). States are taken from the engine after every
+# sampled tick; for an EnsembleEngine every statistic carries a leading replica axis.
+
+
+class Accumulator:
+    name = 'accumulator'
+
+    def __init__(self, symbols=None):
+        self.symbols = symbols
+        self.idx = None
+
+    def bind(self, names, index):
+        self.names = list(names) if self.symbols is None else list(self.symbols)
+        self.idx = slice(None) if self.symbols is None else np.array([index[s] for s in self.symbols], dtype=np.int64)
+
+    def update(self, x):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class Welford(Accumulator):
+    # running mean and population variance (ddof=0, same as np.var)
+    name = 'welford'
+
+    def __init__(self, symbols=None):
+        super().__init__(symbols)
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+
+    def update(self, x):
+        x = x[..., self.idx]
+        if self.mean is None:
+            self.mean = np.zeros(x.shape)
+            self.m2 = np.zeros(x.shape)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def result(self):
+        var = self.m2 / self.count if self.count else self.m2
+        return {'mean': self.mean, 'var': var, 'std': None if var is None else np.sqrt(var)}
+
+
+class MinMax(Accumulator):
+    name = 'minmax'
+
+    def __init__(self, symbols=None):
+        super().__init__(symbols)
+        self.min = None
+        self.max = None
+
+    def update(self, x):
+        x = x[..., self.idx]
+        if self.min is None:
+            self.min = x.copy()
+            self.max = x.copy()
+        else:
+            np.minimum(self.min, x, out=self.min)
+            np.maximum(self.max, x, out=self.max)
+
+    def result(self):
+        return {'min': self.min, 'max': self.max}
+
+
+class Autocorrelation(Accumulator):
+    # lagged products against a ring of the last max(lags) states
+    name = 'autocorrelation'
+
+    def __init__(self, symbols=None, lags=(1, 2, 5, 10)):
+        super().__init__(symbols)
+        self.lags = tuple(lags)
+        self.count = 0
+        self.ring = None
+
+    def update(self, x):
+        x = x[..., self.idx]
+        if self.ring is None:
+            self.ring = np.zeros((max(self.lags),) + x.shape)
+            shape = (len(self.lags),) + x.shape
+            self.pairs = np.zeros(len(self.lags))
+            self.sum_xy = np.zeros(shape)
+            self.sum_x = np.zeros(shape)
+            self.sum_y = np.zeros(shape)
+            self.sum_xx = np.zeros(shape)
+            self.sum_yy = np.zeros(shape)
+        for k, lag in enumerate(self.lags):
+            if self.count >= lag:
+                y = self.ring[(self.count - lag) % len(self.ring)]
+                self.pairs[k] += 1
+                self.sum_xy[k] += x * y
+                self.sum_x[k] += x
+                self.sum_y[k] += y
+                self.sum_xx[k] += x * x
+                self.sum_yy[k] += y * y
+        self.ring[self.count % len(self.ring)] = x
+        self.count += 1
+
+    def result(self):
+        # Pearson correlation of x_t with x_(t-lag); NaN where a series is constant or too short
+        if self.ring is None:
+            return {'acf': None, 'lags': self.lags}
+        n = self.pairs.reshape((-1,) + (1,) * (self.sum_xy.ndim - 1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.sum_xy / n - self.sum_x * self.sum_y / (n * n)
+            vx = self.sum_xx / n - (self.sum_x / n) ** 2
+            vy = self.sum_yy / n - (self.sum_y / n) ** 2
+            acf = cov / np.sqrt(vx * vy)
+        # lag axis last: (..., symbols, lags)
+        return {'acf': np.moveaxis(acf, 0, -1), 'lags': self.lags}
+
+
+class ZeroCrossings(Accumulator):
+    # sign changes between consecutive samples, as a count and a rate per sample step
+    name = 'zero_crossings'
+
+    def __init__(self, symbols=None):
+        super().__init__(symbols)
+        self.count = 0
+        self.last = None
+        self.crossings = None
+
+    def update(self, x):
+        x = x[..., self.idx]
+        if self.last is None:
+            self.crossings = np.zeros(x.shape, dtype=np.int64)
+            self.last = x.copy()
+        else:
+            self.crossings += (x * self.last) < 0
+            np.copyto(self.last, x)
+        self.count += 1
+
+    def result(self):
+        rate = self.crossings / max(1, self.count - 1) if self.crossings is not None else None
+        return {'zero_crossings': self.crossings, 'zero_crossing_rate': rate}
+
+
+class Histogram(Accumulator):
+    # fixed bins over range; values outside go to the under/overflow counts
+    name = 'histogram'
+
+    def __init__(self, symbols=None, bins=32, range=(-1.0, 1.0)):
+        super().__init__(symbols)
+        self.edges = np.linspace(range[0], range[1], bins + 1)
+        self.counts = None
+
+    def update(self, x):
+        x = x[..., self.idx]
+        bins = len(self.edges) - 1
+        if self.counts is None:
+            self.counts = np.zeros(x.shape + (bins + 2,), dtype=np.int64)
+        lo, hi = self.edges[0], self.edges[-1]
+        with np.errstate(invalid='ignore'):
+            b = np.floor((x - lo) / (hi - lo) * bins)
+        b = np.where(np.isnan(b), bins, np.clip(b, -1, bins)).astype(np.int64) + 1
+        flat = self.counts.reshape(-1, bins + 2)
+        flat[np.arange(len(flat)), b.ravel()] += 1
+
+    def result(self):
+        if self.counts is None:
+            return {'histogram': None, 'edges': self.edges, 'underflow': None, 'overflow': None}
+        return {'histogram': self.counts[..., 1:-1], 'edges': self.edges,
+                'underflow': self.counts[..., 0], 'overflow': self.counts[..., -1]}
+
+
+class MetricSet:
+    # run() callback feeding every accumulator; binds symbol names to indices on first use
+    def __init__(self, *accumulators):
+        self.accumulators = list(accumulators)
+        self.bound = False
+
+    def __call__(self, engine, row=None):
+        if not self.bound:
+            model = getattr(engine, 'model', None)
+            names = model.names if model is not None else list(engine.symbols)
+            index = model.index if model is not None else engine.index
+            for acc in self.accumulators:
+                acc.bind(names, index)
+            self.bound = True
+        x = engine.state_vector()
+        for acc in self.accumulators:
+            acc.update(x)
+        return False
+
+    def report(self):
+        # {accumulator name: {statistic: array over (..., symbols[, bins/lags])}}, plus 'symbols' per accumulator
+        out = {}
+        for acc in self.accumulators:
+            res = acc.result()
+            res['symbols'] = getattr(acc, 'names', acc.symbols)
+            out[acc.name] = res
+        return out
+
+    def columns(self, stats=('var',)):
+        # flat {f'{stat}{symbol}': value} for CSV rows (per replica lists for an ensemble)
+        cols = {}
+        for acc in self.accumulators:
+            res = acc.result()
+            for stat in stats:
+                if res.get(stat) is None or np.ndim(res[stat]) == 0:
+                    continue
+                values = np.moveaxis(np.asarray(res[stat]), -1, 0)
+                for name, v in zip(acc.names, values):
+                    cols[f'{stat}{name}'] = v.tolist()
+        return cols
@@ -0,0 +1,119 @@
+import csv
+import numpy as np
+from param_scan import evaluate_points
+from result_store import using_store
+
+try:
+    from scipy.stats import qmc
+except ImportError:
+    qmc = None
+
+# Adaptive parameter scan: a coarse space-filling sample of the box, then rounds of extra points placed
+# between neighbouring samples whose metric differs most (regime boundaries, onset of divergence), so
+# boundaries get dense-grid detail while flat regions keep the coarse spacing.
+
+
+def latin_hypercube(n, d, rng):
+    # one sample per row stratum in every dimension
+    u = (rng.permuted(np.tile(np.arange(n), (d, 1)), axis=1).T + rng.random((n, d))) / n
+    return u
+
+
+def initial_sample(n, d, sampler='lhs', seed=None):
+    if sampler == 'sobol' and qmc is not None:
+        return qmc.Sobol(d, scramble=True, seed=seed).random(n)
+    # Sobol needs SciPy; the Latin hypercube works everywhere
+    return latin_hypercube(n, d, np.random.default_rng(seed))
+
+
+def metric_values(rows, metric, log=True):
+    # metric: result column name or callable(row); log compares orders of magnitude (variances span many).
+    # Non-finite values (diverged runs) rank above every finite one, so the edge of divergence is refined.
+    v = np.array([row[metric] if isinstance(metric, str) else metric(row) for row in rows], dtype=float)
+    if log:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            v = np.log10(np.abs(v) + 1e-300)
+    finite = np.isfinite(v)
+    top = v[finite].max() if finite.any() else 0.0
+    return np.where(finite, v, top + 1.0)
+
+
+def boundary_points(u, values, n_new, neighbours=6, min_dist=1e-3, rng=None):
+    # midpoints of up to n_new nearest-neighbour edges with the steepest metric change
+    d2 = ((u[:, None, :] - u[None, :, :]) ** 2).sum(axis=2)
+    np.fill_diagonal(d2, np.inf)
+    k = min(neighbours, len(u) - 1)
+    if k < 1:
+        return np.zeros((0, u.shape[1]))
+    near = np.argpartition(d2, k - 1, axis=1)[:, :k]
+    i = np.repeat(np.arange(len(u)), k)
+    j = near.ravel()
+    # each undirected edge once
+    a, b = np.minimum(i, j), np.maximum(i, j)
+    _, first = np.unique(a * len(u) + b, return_index=True)
+    i, j = a[first], b[first]
+    dist = np.sqrt(d2[i, j])
+    # metric change per unit distance: a sharp step outranks a long edge across a smooth slope
+    score = np.abs(values[i] - values[j]) / dist
+    score[dist < 2 * min_dist] = -1.0  # already resolved
+    chosen = []
+    for e in np.argsort(-score, kind='stable').tolist():
+        if len(chosen) == n_new or score[e] <= 0:
+            break
+        m = (u[i[e]] + u[j[e]]) / 2
+        # spread the round along the boundary instead of piling onto its steepest spot
+        if all(((m - c) ** 2).sum() > (dist[e] / 4) ** 2 for c, _ in chosen):
+            chosen.append((m, e))
+    if not chosen:
+        return np.zeros((0, u.shape[1]))
+    order = np.array([e for _, e in chosen])
+    mid = np.array([m for m, _ in chosen])
+    if rng is not None:
+        # a little sideways jitter so refined points do not line up on the edges
+        mid += (rng.random(mid.shape) - 0.5) * dist[order, None] * 0.25
+    return np.clip(mid, 0.0, 1.0)
+
+
+def run_adaptive_scan(model_file, bounds, output_csv='adaptive_scan.csv', initial=64, rounds=6, per_round=32,
+                      metric=None, log=True, sampler='lhs', steps=100, seed=None, workers=1, chunk=64,
+                      base_config=None, monitor=None, profile='core', store=None):
+    # bounds: {config key: (low, high)}; base_config fixes the other keys.
+    # metric: result column (default: the first recorded variance) or callable(row).
+    # Returns all result rows (also written to output_csv) with a 'round' column, 0 for the initial sample.
+    # store: result_store.ResultStore or path; a repeated scan with the same seed reads its points from it.
+    keys = list(bounds)
+    lo = np.array([bounds[k][0] for k in keys], dtype=float)
+    hi = np.array([bounds[k][1] for k in keys], dtype=float)
+    seeds = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(seeds.spawn(1)[0])
+    u = initial_sample(initial, len(keys), sampler, int(rng.integers(2 ** 32)))
+    rows = []
+    units = np.zeros((0, len(keys)))
+    with using_store(store) as store, open(output_csv, 'w', newline='') as csvf:
+        writer = None
+        for rnd in range(rounds + 1):
+            if len(u) == 0:
+                break
+            points = [dict(base_config or {}, **dict(zip(keys, (lo + x * (hi - lo)).tolist()))) for x in u]
+            new = [None] * len(points)
+            for positions, result in evaluate_points(model_file, points, seeds.spawn(len(points)), steps, workers,
+                                                     chunk, monitor, profile, store=store):
+                for p, row in zip(positions, result):
+                    row['round'] = rnd
+                    new[p] = row
+                if writer is None:
+                    writer = csv.DictWriter(csvf, fieldnames=list(result[0]))
+                    writer.writeheader()
+                writer.writerows(result)
+                csvf.flush()
+            rows += new
+            units = np.vstack([units, u])
+            if metric is None:
+                metric = next(k for k in rows[0] if k.startswith('var'))
+            u = boundary_points(units, metric_values(rows, metric, log), per_round, rng=rng)
+    print(f'Adaptive scan complete, {len(rows)} points, wrote {output_csv}')
+    return rows
+
+
+if __name__ == '__main__':
+    run_adaptive_scan('model_v04.json', {'decay_rate': (0.8, 1.0), 'bind_coeff': (0.05, 0.3), 'cycle_coeff': (0.2, 0.9)})
@@ -0,0 +1,201 @@
+import csv
+import numpy as np
+from accumulators import Accumulator
+from stopping import FIXED_POINT, PERIODIC, DIVERGED
+
+# Attractor classification without plots. Each run's tail (the last `window` states, from a trajectory or
+# kept online by TailWindow) is reduced to a few features, all computed for every run at once:
+#   amplitude        - RMS distance from the tail mean
+#   recurrence       - smallest over lags 1..max_period of the largest ||x_t - x_(t-lag)||, relative to amplitude
+#   period           - first lag with recurrence below period_tol (0 if none)
+#   spectral_entropy - entropy of the Hann-windowed power spectrum, 0 for one line, 1 for white noise
+#   spread           - fraction of frequency bins holding 90% of the power
+# and labelled fixed point, periodic (limit cycle, with period), quasi-periodic (a few incommensurate lines,
+# no exact recurrence) or chaotic (broadband). Runs driven by random modifiers are broadband and land in the
+# chaotic class. cluster_runs() groups runs by their features with k-means for finer distinctions
+# (e.g. two different limit cycles, weak and strong chaos).
+
+QUASI_PERIODIC = 'quasi_periodic'
+CHAOTIC = 'chaotic'
+REGIMES = (FIXED_POINT, PERIODIC, QUASI_PERIODIC, CHAOTIC, DIVERGED)
+FEATURES = ('amplitude', 'recurrence', 'period', 'spectral_entropy', 'spread')
+WINDOW = 512
+TINY = 1e-300
+
+
+class TailWindow(Accumulator):
+    # ring of the last `window` states, the online input of classify(); for an ensemble (window, N, m)
+    name = 'tail_window'
+
+    def __init__(self, symbols=None, window=WINDOW):
+        super().__init__(symbols)
+        self.window = window
+        self.count = 0
+        self.ring = None
+
+    def update(self, x):
+        x = x[..., self.idx]
+        if self.ring is None:
+            self.ring = np.zeros((self.window,) + x.shape)
+        self.ring[self.count % self.window] = x
+        self.count += 1
+
+    def trajectory(self):
+        # (..., T, m) in time order, T = min(count, window)
+        if self.ring is None:
+            return None
+        if self.count < self.window:
+            tail = self.ring[:self.count]
+        else:
+            tail = np.roll(self.ring, -(self.count % self.window), axis=0)
+        return np.moveaxis(tail, 0, -2)
+
+    def result(self):
+        return {'trajectory': self.trajectory()}
+
+
+def attractor_features(traj, max_period=100, period_tol=1e-6, max_norm=1e6):
+    # traj: (T, n) for one run or (runs, T, n); returns {feature: (runs,) array} plus 'diverged'
+    x = np.asarray(traj, dtype=float)
+    if x.ndim == 2:
+        x = x[None]
+    runs, length, n = x.shape
+    finite = np.isfinite(x).all(axis=(1, 2))
+    x = np.where(finite[:, None, None], x, 0.0)
+    with np.errstate(over='ignore'):
+        diverged = ~finite | (np.sqrt((x * x).sum(axis=2)).max(axis=1) > max_norm)
+    x = np.where(diverged[:, None, None], 0.0, x)
+
+    dev = x - x.mean(axis=1, keepdims=True)
+    amplitude = np.sqrt((dev * dev).sum(axis=2).mean(axis=1))
+    scale = np.maximum(amplitude, TINY)
+
+    lags = min(max_period, length // 2)
+    recur = np.full((runs, max(lags, 1)), np.inf)
+    # symbol-major copy: each lag is n contiguous (runs, T) differences
+    xs = np.ascontiguousarray(np.moveaxis(x, 2, 0))
+    for lag in range(1, lags + 1):
+        sq = np.zeros((runs, length - lags))
+        for k in range(n):
+            d = xs[k, :, lags:] - xs[k, :, lags - lag:length - lag]
+            sq += d * d
+        recur[:, lag - 1] = np.sqrt(sq.max(axis=1)) / scale
+    close = recur <= period_tol
+    period = np.where(close.any(axis=1), close.argmax(axis=1) + 1, 0)
+
+    # Hann window keeps the lines of quasi-periodic runs narrow; DC left out
+    power = (np.abs(np.fft.rfft(dev * np.hanning(length)[None, :, None], axis=1)) ** 2).sum(axis=2)[:, 1:]
+    bins = power.shape[1]
+    total = power.sum(axis=1, keepdims=True)
+    p = power / np.where(total > 0, total, 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = -np.where(p > 0, p * np.log(p), 0.0).sum(axis=1) / np.log(max(bins, 2))
+    cum = np.cumsum(-np.sort(-p, axis=1), axis=1)
+    spread = np.minimum((cum < 0.9).sum(axis=1) + 1, bins) / max(bins, 1)
+    return {'amplitude': amplitude, 'recurrence': recur.min(axis=1), 'period': period,
+            'spectral_entropy': entropy, 'spread': spread, 'diverged': diverged,
+            'mean_norm': np.sqrt((x.mean(axis=1) ** 2).sum(axis=1))}
+
+
+def classify_features(features, tol=1e-8, spread_tol=0.05):
+    # (regimes, periods) from attractor_features(); fixed point when the amplitude is below tol relative
+    # to max(1, |mean state|), quasi-periodic when 90% of the power sits in less than spread_tol of the bins
+    regimes = np.where(features['spread'] < spread_tol, QUASI_PERIODIC, CHAOTIC).astype(object)
+    periods = np.asarray(features['period']).copy()
+    regimes[periods > 0] = PERIODIC
+    fixed = (features['amplitude'] <= tol * np.maximum(1.0, features['mean_norm'])) | (periods == 1)
+    regimes[fixed] = FIXED_POINT
+    periods[fixed] = 1
+    regimes[features['diverged']] = DIVERGED
+    periods[features['diverged']] = 0
+    return regimes, periods
+
+
+def classify(traj, max_period=100, period_tol=1e-6, tol=1e-8, spread_tol=0.05, max_norm=1e6):
+    # traj: (T, n) or (runs, T, n), the tail of each run after its transient
+    # returns (regimes, periods, features) with one entry per run
+    features = attractor_features(traj, max_period, period_tol, max_norm)
+    regimes, periods = classify_features(features, tol, spread_tol)
+    return regimes, periods, features
+
+
+def regime_columns(window, **options):
+    # scan result columns from a TailWindow fed by an ensemble run: regime, period and the features
+    regimes, periods, features = classify(window.trajectory(), **options)
+    cols = {'regime': regimes.tolist(), 'period': periods.tolist()}
+    for name in FEATURES:
+        if name != 'period':
+            cols[name] = features[name].tolist()
+    return cols
+
+
+def feature_matrix(features):
+    # standardized features for clustering; amplitude and recurrence span orders of magnitude
+    data = np.column_stack([np.log10(np.asarray(features['amplitude'], dtype=float) + 1e-15),
+                            np.log10(np.minimum(np.asarray(features['recurrence'], dtype=float), 1e15) + 1e-15),
+                            np.log1p(np.asarray(features['period'], dtype=float)),
+                            np.asarray(features['spectral_entropy'], dtype=float),
+                            np.log10(np.asarray(features['spread'], dtype=float))])
+    std = data.std(axis=0)
+    return (data - data.mean(axis=0)) / np.where(std > 0, std, 1.0)
+
+
+def kmeans(data, k, seed=None, iters=100):
+    # Lloyd iterations from k-means++ seeds; returns (labels, centers)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centers = np.empty((k, data.shape[1]))
+    centers[0] = data[rng.integers(len(data))]
+    d2 = ((data - centers[0]) ** 2).sum(axis=1)
+    for j in range(1, k):
+        total = d2.sum()
+        centers[j] = data[rng.choice(len(data), p=d2 / total) if total > 0 else rng.integers(len(data))]
+        d2 = np.minimum(d2, ((data - centers[j]) ** 2).sum(axis=1))
+    labels = None
+    for _ in range(iters):
+        dist = (data * data).sum(axis=1)[:, None] - 2 * data @ centers.T + (centers * centers).sum(axis=1)
+        new = dist.argmin(axis=1)
+        if labels is not None and (new == labels).all():
+            break
+        labels = new
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, data)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+    return labels, centers
+
+
+def cluster_runs(features, k=4, seed=0):
+    # cluster ids per run, largest cluster first; diverged runs get -1
+    valid = ~np.asarray(features.get('diverged', np.zeros(len(features['amplitude']), dtype=bool)), dtype=bool)
+    labels = np.full(len(valid), -1)
+    if not valid.any():
+        return labels
+    sub = {name: np.asarray(features[name])[valid] for name in FEATURES}
+    found, _ = kmeans(feature_matrix(sub), k, seed)
+    order = np.argsort(-np.bincount(found))
+    labels[valid] = np.argsort(order)[found]
+    return labels
+
+
+def cluster_scan(csv_path, k=4, seed=0, output_csv=None):
+    # adds a 'cluster' column to a scan CSV written with regime=True (in place by default)
+    with open(csv_path, newline='') as csvf:
+        reader = csv.DictReader(csvf)
+        fields = list(reader.fieldnames)
+        rows = list(reader)
+    features = {name: np.array([float(row[name]) for row in rows]) for name in FEATURES}
+    features['diverged'] = np.array([row['regime'] == DIVERGED for row in rows])
+    labels = cluster_runs(features, k, seed)
+    if 'cluster' not in fields:
+        fields.append('cluster')
+    with open(output_csv or csv_path, 'w', newline='') as csvf:
+        writer = csv.DictWriter(csvf, fieldnames=fields)
+        writer.writeheader()
+        for row, label in zip(rows, labels):
+            row['cluster'] = int(label)
+            writer.writerow(row)
+    counts = {r: sum(row['regime'] == r for row in rows) for r in REGIMES}
+    print(f'{len(rows)} points: ' + ', '.join(f'{r} {c}' for r, c in counts.items() if c) + f', {k} clusters')
+    return labels
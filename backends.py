@@ -0,0 +1,69 @@
+import sys
+import numpy as np
+from symbolic_core import SymbolicEngine, PROFILES, PROPAGATION_MODES
+from symbolic_vector import VectorEngine
+from model_cache import load_cached
+from symbolic_sparse import SparseEngine
+from ensemble import EnsembleEngine
+from event_log import LOG_OFF
+
+# One engine, three interchangeable implementations of the same profile/propagation semantics:
+#   reference - per-symbol Python objects, easiest to read and debug
+#   vector    - staged numpy arrays, bit-identical to reference under the same seed
+#   sparse    - one sparse mat-vec per link type and tick ('simultaneous' only; 'sequential' runs staged)
+BACKENDS = {'reference': SymbolicEngine, 'vector': VectorEngine, 'sparse': SparseEngine}
+
+SMALL_MODEL = 64          # symbols below which the object engine is fast enough
+SPARSE_MIN_LINKS = 10000  # links above which the sparse operators beat the staged kernels
+
+
+def choose_backend(n_symbols, n_links, propagation='sequential'):
+    if n_symbols < SMALL_MODEL:
+        return 'reference'
+    if propagation == 'simultaneous' and n_links >= SPARSE_MIN_LINKS:
+        return 'sparse'
+    return 'vector'
+
+
+def make_engine(model, profile='core', backend='auto', propagation='sequential', config=None, seed=None,
+                log_level=LOG_OFF):
+    # model: path of a JSON or binary model (compiled through model_cache) or a symbolic_vector.CompiledModel
+    if isinstance(model, str):
+        model = load_cached(model)
+    if backend == 'auto':
+        backend = choose_backend(model.n_symbols, model.n_links, propagation)
+    if backend not in BACKENDS:
+        raise ValueError(f'unknown backend {backend}')
+    engine = BACKENDS[backend](config=config, log_level=log_level, seed=seed, profile=profile, propagation=propagation)
+    engine.load_compiled(model)
+    return engine
+
+
+def compare_backends(model, profile='core', propagation='sequential', steps=200, seed=0, config=None,
+                     rtol=1e-9, atol=1e-12):
+    # Runs every backend (and one EnsembleEngine replica) from the same seed and reports the largest
+    # deviation from the reference trajectory. Returns {backend: max_abs_diff}; raises AssertionError
+    # when a backend leaves the tolerance.
+    if isinstance(model, str):
+        model = load_cached(model)
+    ref = make_engine(model, profile, 'reference', propagation, config, seed).run(steps)
+    runs = {name: make_engine(model, profile, name, propagation, config, seed).run(steps)
+            for name in BACKENDS if name != 'reference'}
+    ens = EnsembleEngine([config], seeds=[seed], profile=profile, propagation=propagation)
+    ens.load_compiled(model)
+    runs['ensemble'] = ens.run(steps)[:, 0, :]
+    report = {}
+    for name, out in runs.items():
+        report[name] = float(np.max(np.abs(out - ref))) if ref.size else 0.0
+        if not np.allclose(out, ref, rtol=rtol, atol=atol):
+            raise AssertionError(f'{name} backend deviates from reference ({profile}, {propagation}): {report[name]:.3g}')
+    return report
+
+
+if __name__ == '__main__':
+    models = sys.argv[1:] or ['model_v04.json', 'random_net.json']
+    for path in models:
+        for profile in PROFILES:
+            for propagation in PROPAGATION_MODES:
+                report = compare_backends(path, profile, propagation)
+                print(path, profile, propagation, ' '.join(f'{k}={v:.2e}' for k, v in report.items()))
@@ -0,0 +1,145 @@
+import numpy as np
+from symbolic_core import PROFILES
+from model_cache import load_cached
+from noise import NoiseLayout, seed_key
+from modifier_rules import compile_modifiers
+
+
+class EnsembleEngine:
+    # N replicas of one model advanced together: state is an (N_replicas x N_symbols) matrix,
+    # every config key becomes a per-replica column and every replica has its own random stream.
+    # Draws use the NoiseStream layout, so replica i reproduces VectorEngine(seed=seeds[i]) with the same
+    # profile and propagation mode exactly. Replicas given equal seeds share one generator (common random
+    # numbers, e.g. paired A/B configs or Lyapunov twins): the numbers are drawn once and used by every row.
+    def __init__(self, configs, seeds=None, block=64, profile='core', propagation='sequential'):
+        self.profile_name = profile
+        self.profile = PROFILES[profile]
+        self.propagation = propagation
+        self.configs = [dict(self.profile['config'], **(c or {})) for c in configs]
+        self.n = len(self.configs)
+        self.params = {k: np.array([c[k] for c in self.configs], dtype=float)[:, None]
+                       for k in self.configs[0] if all(isinstance(c.get(k), (int, float)) for c in self.configs)}
+        if seeds is None:
+            seeds = np.random.SeedSequence().spawn(self.n)
+        self.seeds = list(seeds)
+        streams = {}
+        self.noise_rows = np.array([streams.setdefault(seed_key(s) or ('row', i), len(streams))
+                                    for i, s in enumerate(self.seeds)], dtype=np.int64)
+        first = np.unique(self.noise_rows, return_index=True)[1]
+        self.rngs = [np.random.default_rng(self.seeds[i]) for i in first]
+        self.block = block
+        self.step_count = 0
+        self.model = None
+        self.state = np.zeros((self.n, 0))
+        self.prev = np.zeros((self.n, 0))
+        self.input_idx = np.zeros(0, dtype=np.int64)
+        self.input_gain = np.zeros(0)
+
+    def load_model(self, filepath):
+        # compiled once per file content, shared by every scan that loads the same model
+        self.load_compiled(load_cached(filepath))
+
+    def load_compiled(self, model):
+        self.model = model
+        self.state = np.repeat(model.states[None, :], self.n, axis=0)
+        self.prev = self.state.copy()
+        n_base = model.n_symbols if self.profile['base_noise'] else 0
+        self.layout = NoiseLayout([m.rule for m in model.modifiers], n_base)
+        self.mod_stages, unknown = compile_modifiers(model.modifiers, model.index, self.layout, self.profile['rules'])
+        self.stages = model.link_stages(self.profile_name, self.propagation)
+        self.n_draws = self.layout.width
+        self._noise = np.empty((0, self.n, self.n_draws))
+        self._noise_pos = 0
+
+    def next_noise(self):
+        # each replica's generator fills a block of ticks at once
+        if self._noise_pos >= len(self._noise):
+            self._noise = np.stack([rng.random((self.block, self.n_draws)) for rng in self.rngs], axis=1)
+            if len(self.rngs) < self.n:
+                self._noise = self._noise[:, self.noise_rows]
+            self._noise_pos = 0
+        u = self._noise[self._noise_pos]
+        self._noise_pos += 1
+        return u
+
+    def apply_modifiers(self, u):
+        for stage in self.mod_stages:
+            for group in stage:
+                new, fired, value = group.rule.kernel(self.state[:, group.idx], u[:, group.cols], self.params)
+                self.state[:, group.idx] = new
+
+    def propagate(self):
+        bind_coeff = self.params['bind_coeff']
+        cycle_coeff = self.params['cycle_coeff']
+        pull = self.profile['cycle'] == 'pull'
+        for stage in self.stages:
+            delta = np.empty((self.n, len(stage.to_idx)))
+            delta[:, stage.bind_pos] = self.state[:, stage.bind_from] * stage.bind_weight * bind_coeff
+            if pull:
+                delta[:, stage.cycle_pos] = (self.prev[:, stage.cycle_from] - self.state[:, stage.cycle_to]) * cycle_coeff
+            else:
+                delta[:, stage.cycle_pos] = self.prev[:, stage.cycle_from] * cycle_coeff
+            np.add.at(self.state, (slice(None), stage.to_idx), delta)
+
+    def tick(self):
+        self.step_count += 1
+        if self.profile['prev_at_start']:
+            np.copyto(self.prev, self.state)
+        u = self.next_noise()
+        self.apply_modifiers(u)
+        self.propagate()
+        self.state *= self.params['decay_rate']
+        if self.profile['base_noise']:
+            nb = self.params['noise_base']
+            self.state += -nb + (nb + nb) * u[:, self.layout.base]
+        if not self.profile['prev_at_start']:
+            np.copyto(self.prev, self.state)
+
+    def state_vector(self):
+        return self.state
+
+    def set_inputs(self, channels):
+        # same channel mapping as SymbolicEngine.set_inputs, applied to every replica
+        channels = list(channels.items() if isinstance(channels, dict) else channels)
+        for name, gain in channels:
+            if name not in self.model.index:
+                raise ValueError(f'unknown input symbol {name}')
+        self.input_idx = np.array([self.model.index[name] for name, gain in channels], dtype=np.int64)
+        self.input_gain = np.array([gain for name, gain in channels], dtype=float)
+
+    def drive(self, inputs, record=None):
+        # inputs: (T x channels) shared by all replicas, or (T x N_replicas x channels) per replica;
+        # returns (T, N_replicas, len(record)) states after each tick. Iterators of chunks give a generator.
+        if not isinstance(inputs, (np.ndarray, list, tuple)):
+            return (self.drive(np.asarray(chunk), record) for chunk in inputs)
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.ndim == 1:
+            inputs = inputs[:, None]
+        if inputs.shape[-1] != len(self.input_idx):
+            raise ValueError(f'{inputs.shape[-1]} input columns for {len(self.input_idx)} channels')
+        idx = np.arange(self.model.n_symbols) if record is None else np.array([self.model.index[r] for r in record], dtype=np.int64)
+        out = np.empty((len(inputs), self.n, len(idx)))
+        for i, row in enumerate(inputs):
+            np.add.at(self.state, (slice(None), self.input_idx), np.broadcast_to(row * self.input_gain, (self.n, len(self.input_idx))))
+            self.tick()
+            out[i] = self.state[:, idx]
+        return out
+
+    def run(self, steps, record=None, every=1, callback=None, monitor=None):
+        # returns (steps // every, N_replicas, len(record)) states sampled after every k-th tick;
+        # callback(engine, row) is called at each sample and may return True to stop early;
+        # monitor (stopping.StopMonitor) classifies each replica and ends the run once all have settled
+        idx = np.arange(self.model.n_symbols) if record is None else np.array([self.model.index[r] for r in record], dtype=np.int64)
+        out = np.empty((steps // every, self.n, len(idx)))
+        if monitor is not None:
+            monitor.reset(self.n)
+        for i in range(1, steps + 1):
+            self.tick()
+            if i % every == 0:
+                row = i // every - 1
+                out[row] = self.state[:, idx]
+                if callback is not None and callback(self, out[row]):
+                    return out[:row + 1]
+            if monitor is not None and monitor.update(self.step_count, self.state):
+                return out[:i // every]
+        return out
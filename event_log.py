@@ -0,0 +1,284 @@
+import threading
+import numpy as np
+
+# verbosity levels
+LOG_OFF = 0
+LOG_STATES = 1
+LOG_EVENTS = 2
+
+# record kinds
+MESSAGE = 0
+TICK = 1
+STATES = 2
+BIND = 3
+CYCLE = 4
+DECAY = 5
+INVERT = 6
+THRESHOLD_INVERT = 7
+RANDOM_INVERT = 8
+NOISE_SEED = 9
+BACKGROUND_NOISE = 10
+UNKNOWN = 11
+
+# records collected before they are written to the ring buffer in one block
+BATCH = 4096
+
+RECORD = np.dtype([('step', np.int64), ('kind', np.int8), ('src', np.int32), ('dst', np.int32),
+                   ('value', np.float64), ('old', np.float64), ('new', np.float64)])
+
+
+class EventLog:
+    # Ring buffer of typed event records. Text is only produced when lines are read,
+    # so the log keeps the list interface (append, len, iteration, slicing) the GUI and export_log use.
+    # Records are batched and written to the rings BATCH at a time (or when read); the rings start empty
+    # and grow up to capacity / state_budget, so LOG_OFF engines and short-lived forks stay small.
+    # A lock guards the batch: worker threads may log while another thread reads.
+    def __init__(self, level=LOG_EVENTS, formats=None, capacity=200000, state_budget=2000000):
+        self.level = level
+        self.formats = formats or {}
+        self.capacity = capacity
+        self.state_budget = state_budget
+        self.records = None
+        self.text = None
+        self.count = 0
+        self.names = []
+        self.max_states = min(capacity, state_budget)   # rows of the state ring once fully grown
+        self.states = None
+        self.state_count = 0
+        self.state_base = 0
+        self._pending = []
+        self._pending_states = 0
+        self.lock = threading.Lock()
+        self.sink = None
+
+    def attach(self, sink):
+        # stream every record written from now on to sink (see sinks.py) as well as to the ring buffer
+        with self.lock:
+            self._flush()
+            self.sink = sink
+
+    def detach(self):
+        with self.lock:
+            self._flush()
+            sink, self.sink = self.sink, None
+        if sink is not None:
+            sink.close()
+        return sink
+
+    def set_names(self, names):
+        with self.lock:
+            # pending STATES records still refer to the old state ring
+            self._flush()
+            # a numpy string array is kept as is (array backends share the model's name table)
+            self.names = names if isinstance(names, np.ndarray) else list(names)
+            self.max_states = max(1, min(self.capacity, self.state_budget // max(1, len(self.names))))
+            self.states = None
+            # snapshots recorded under the previous name table can no longer be formatted
+            self.state_base = self.state_count
+
+    # --- recording ---
+
+    def append(self, text):
+        self.event(0, MESSAGE, -1, -1, text=text)
+
+    def event(self, step, kind, src=-1, dst=-1, value=0.0, old=0.0, new=0.0, text=None):
+        with self.lock:
+            self._pending.append((step, kind, src, dst, value, old, new, text))
+            if len(self._pending) >= BATCH:
+                self._flush()
+
+    def extend(self, records):
+        # (step, kind, src, dst, value, old, new, text) tuples collected by an engine over one tick
+        with self.lock:
+            self._pending.extend(records)
+            if len(self._pending) >= BATCH:
+                self._flush()
+
+    def events(self, step, kind, src, dst, value=0.0, old=0.0, new=0.0):
+        n = len(dst)
+        if n == 0:
+            return
+        block = np.zeros(n, dtype=RECORD)
+        block['step'] = step
+        block['kind'] = kind
+        block['src'] = src
+        block['dst'] = dst
+        block['value'] = value
+        block['old'] = old
+        block['new'] = new
+        with self.lock:
+            self._flush()
+            self._write(block, None)
+
+    def end_tick(self, step, values, records=None):
+        # records: the tick's event tuples, written ahead of its TICK and STATES records.
+        # The state row rides in the STATES tuple and reaches the state ring with its batch.
+        if self.level < LOG_STATES:
+            return
+        if not isinstance(values, list):
+            # array backends pass their live state vector
+            values = np.array(values)
+        with self.lock:
+            pending = self._pending
+            if records:
+                pending.extend(records)
+            pending.append((step, TICK, -1, -1, 0.0, 0.0, 0.0, None))
+            pending.append((step, STATES, -1, -1, self.state_count, 0.0, 0.0, values))
+            self._pending_states += 1
+            self.state_count += 1
+            # pending rows are bounded by the state budget, like the ring itself
+            if len(pending) >= BATCH or self._pending_states >= self.max_states:
+                self._flush()
+
+    def store_states(self, idx, rows):
+        # rows since state_base keep their slot (idx - state_base) % len(states); the ring doubles
+        # until it holds max_states rows, it never wraps before that
+        used = self.state_count - self.state_base
+        if self.states is None or (used > len(self.states) and len(self.states) < self.max_states):
+            size = min(self.max_states, max(64, 1 << (used - 1).bit_length()))
+            states = np.zeros((size, len(self.names)))
+            if self.states is not None:
+                states[:len(self.states)] = self.states
+            self.states = states
+        if not len(self.names):
+            return
+        keep = len(self.states)
+        self.states[(idx[-keep:] - self.state_base) % keep] = np.array(rows[-keep:], dtype=float)
+
+    def grow(self, n):
+        # record ring large enough for n records (up to capacity); only called before it wraps
+        size = min(self.capacity, max(64, 1 << (n - 1).bit_length()))
+        records = np.zeros(size, dtype=RECORD)
+        text = np.empty(size, dtype=object)
+        if self.records is not None:
+            # a batch longer than capacity moves count past the old ring; it overwrites everything anyway
+            kept = min(self.count, len(self.records))
+            records[:kept] = self.records[:kept]
+            text[:kept] = self.text[:kept]
+        self.records, self.text = records, text
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        # caller holds the lock
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        # column by column is the cheapest conversion of the tuples
+        columns = list(zip(*pending))
+        block = np.empty(len(pending), dtype=RECORD)
+        for name, column in zip(RECORD.names, columns):
+            block[name] = np.fromiter(column, dtype=RECORD[name], count=len(pending))
+        text = list(columns[7])
+        rows = None
+        if self._pending_states:
+            self._pending_states = 0
+            where = np.flatnonzero(block['kind'] == STATES)
+            idx = block['value'][where].astype(np.int64)
+            state_rows = [text[i] for i in where.tolist()]
+            for i in where.tolist():
+                text[i] = None
+            self.store_states(idx, state_rows)
+            rows = dict(zip(idx.tolist(), state_rows))
+        self._write(block, text, rows)
+
+    def _write(self, block, text, rows=None):
+        # rows: {state index: state row} of the STATES records in block
+        if self.sink is not None:
+            # state rows travel with the records: the ring slot may be reused before the sink formats them
+            rows = {i: np.array(row, dtype=float) for i, row in (rows or {}).items()}
+            self.sink.put(block, text, rows, self.names, self.formats)
+        n = len(block)
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            text = text[-self.capacity:] if text is not None else None
+            self.count += n - self.capacity
+            n = self.capacity
+        if self.records is None or (self.count + n > len(self.records) and len(self.records) < self.capacity):
+            self.grow(min(self.count + n, self.capacity))
+        # at most one wrap: n <= capacity, and a ring below capacity was grown to fit
+        size = len(self.records)
+        start = self.count % size
+        first = min(n, size - start)
+        self.records[start:start + first] = block[:first]
+        self.records[:n - first] = block[first:]
+        self.text[start:start + first] = None
+        self.text[:n - first] = None
+        if text is not None and text.count(None) < n:
+            for i, t in enumerate(text):
+                if t is not None:
+                    self.text[(self.count + i) % size] = t
+        self.count += n
+
+    def state_row(self, idx):
+        return self.states[(idx - self.state_base) % len(self.states)]
+
+    def clear(self):
+        with self.lock:
+            self._pending = []
+            self._pending_states = 0
+            self.count = 0
+            self.state_base = self.state_count
+
+    # --- reading ---
+
+    def __len__(self):
+        return min(self.count + len(self._pending), self.capacity)
+
+    def __iter__(self):
+        self.flush()
+        n = len(self)
+        for start in range(0, n, BATCH):
+            yield from self.lines(start, min(n, start + BATCH))
+
+    def __getitem__(self, item):
+        n = len(self)
+        if isinstance(item, slice):
+            start, stop, stride = item.indices(n)
+            if stride != 1:
+                return self.lines(start, stop)[::stride]
+            return self.lines(start, stop)
+        if item < 0:
+            item += n
+        if not 0 <= item < n:
+            raise IndexError('log index out of range')
+        return self.lines(item, item + 1)[0]
+
+    def lines(self, start=0, stop=None):
+        with self.lock:
+            self._flush()
+            n = len(self)
+            stop = n if stop is None else min(stop, n)
+            if start >= stop:
+                return []
+            pos = (np.arange(start, stop) + self.count - n) % len(self.records)
+            return [self.format(rec, self.text[p]) for p, rec in zip(pos.tolist(), self.records[pos].tolist())]
+
+    def format(self, rec, text):
+        row = None
+        if rec[1] == STATES:
+            idx = int(rec[4])
+            if self.states is not None and idx >= self.state_base and self.state_count - idx <= len(self.states):
+                row = self.state_row(idx)
+        return format_record(rec, text, self.names, self.formats, row)
+
+
+def format_record(rec, text, names, formats, row=None):
+    # row: the state vector of a STATES record (None when it is no longer available)
+    step, kind, src, dst, value, old, new = rec
+    if kind == MESSAGE:
+        return text
+    if kind == STATES:
+        if not len(names):
+            body = '(none)'
+        elif row is None:
+            body = '(dropped)'
+        else:
+            body = ', '.join([f'{n}={v:.4f}' for n, v in zip(names, row.tolist())])
+        return f'[{step}] States: {body}'
+    fields = {'value': value, 'old': old, 'new': new, 'text': text,
+              'src': names[src] if src >= 0 else '', 'dst': names[dst] if dst >= 0 else ''}
+    return f'[{step}] ' + formats.get(kind, 'event {kind}').format(kind=kind, **fields)
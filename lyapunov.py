@@ -1,38 +1,276 @@
-
 import numpy as np
-from symbolic_core import SymbolicEngine
+from symbolic_core import PROFILES, LOG_OFF
+from symbolic_vector import VectorEngine, CompiledModel
+from ensemble import EnsembleEngine
+from model_cache import load_cached
+from param_scan import make_grid, evaluate, point_seeds
+from result_store import using_store
+import csv
 import math
+import warnings
+
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+
+# Lyapunov exponents per tick (natural log). Between modifier firings a tick is linear, so tangent
+# vectors follow it exactly:
+#   v' = decay * (A diag(s) v + B v0)
+# with v0 the tangent at tick start, s the modifier slopes of the tick (-1 for an inversion, 0 for a
+# fired noise seed) and A, B the link propagation applied to the state and to prev. A and B depend only on
+# the model and config, so they are built once per run.
+
+# rough cost of one sparse product call, in multiply-adds per tangent vector
+CALL_COST = 20000
+
+class RowOperator:
+    # (m x n) operator in COO form for k vectors at once, used when SciPy is not installed
+    def __init__(self, rows, cols, data, m):
+        self.rows = rows
+        self.cols = cols
+        self.data = data
+        self.m = m
+
+    def __matmul__(self, V):
+        out = np.zeros((self.m,) + V.shape[1:])
+        np.add.at(out, self.rows, self.data[:, None] * V[self.cols])
+        return out
+
+def row_operator(rows, cols, data, m, n):
+    if sp is not None:
+        return sp.csr_matrix((data, (rows, cols)), shape=(m, n))
+    return RowOperator(rows, cols, data, m)
+
+class TangentMap:
+    # Applies a tick to k tangent vectors, either stage by stage like LinkStage (cost ~ links per vector) or
+    # through A and B composed once (cheaper for few vectors, as long as the composition stays sparse enough)
+    def __init__(self, model, config, profile='core', propagation='sequential', k=1):
+        n = model.n_symbols
+        pull = PROFILES[profile]['cycle'] == 'pull'
+        bc, cc = config['bind_coeff'], config['cycle_coeff']
+        self.decay = config['decay_rate']
+        self.stages = []
+        for stage in model.link_stages(profile, propagation):
+            # each stage reads its start: v[rows] += D v + P v0 over the rows it writes
+            rows, local = np.unique(stage.to_idx, return_inverse=True)
+            d_rows = [local[stage.bind_pos]]
+            d_cols = [stage.bind_from]
+            d_data = [stage.bind_weight.astype(float) * bc]
+            if pull:
+                d_rows.append(local[stage.cycle_pos])
+                d_cols.append(stage.cycle_to)
+                d_data.append(np.full(len(stage.cycle_pos), -cc))
+            D = row_operator(np.concatenate(d_rows), np.concatenate(d_cols), np.concatenate(d_data), len(rows), n)
+            P = row_operator(local[stage.cycle_pos], stage.cycle_from, np.full(len(stage.cycle_pos), cc), len(rows), n)
+            self.stages.append((rows, D, P))
+        budget = 2 * model.n_links + len(self.stages) * CALL_COST / k
+        self.A, self.B = self.compose(n, budget)
 
-def estimate_lyapunov(model_file, steps=100, eps=1e-5):
-    engine1 = SymbolicEngine()
+    def compose(self, n, budget):
+        # (A, B) with the decay folded in, or (None, None) once they outgrow the budget
+        if sp is None:
+            if 2 * n * n > budget:
+                return None, None
+            A, B = np.eye(n), np.zeros((n, n))
+            for rows, D, P in self.stages:
+                A[rows] += D @ A
+                B[rows] += D @ B + P @ np.eye(n)
+            return A * self.decay, B * self.decay
+        A = sp.identity(n, format='csr')
+        B = sp.csr_matrix((n, n))
+        for rows, D, P in self.stages:
+            lift = sp.csr_matrix((np.ones(len(rows)), (rows, np.arange(len(rows)))), shape=(n, len(rows)))
+            A = A + lift @ (D @ A)
+            B = B + lift @ (D @ B + P)
+            if A.nnz + B.nnz > budget:
+                return None, None
+        # dense products are faster once most entries are filled in
+        A = A.toarray() if A.nnz > n * n / 8 else A.tocsr()
+        B = B.toarray() if B.nnz > n * n / 8 else B.tocsr()
+        return A * self.decay, B * self.decay
+
+    def apply(self, V, slopes):
+        if self.A is not None:
+            return self.A @ (slopes[:, None] * V) + self.B @ V
+        V0 = V
+        V = slopes[:, None] * V
+        for rows, D, P in self.stages:
+            V[rows] += D @ V + P @ V0
+        V *= self.decay
+        return V
+
+def lyapunov_spectrum(model_file, k=None, steps=1000, transient=100, qr_every=5, blocks=10, config=None,
+                      seed=None, profile='core', propagation='sequential'):
+    # Benettin method: k orthonormal tangent vectors (default all symbols) evolved with the run and
+    # re-orthonormalized by QR every qr_every ticks; the exponents are the mean log growth of the R diagonal.
+    # Returns {'exponents': k largest, descending, 'stderr': batch-means error over `blocks` time blocks,
+    # 'history': running estimate at the end of each block (blocks, k), 'steps', 'symbols'}.
+    # Model files or CompiledModels; -inf marks directions a fired noise seed wiped out.
+    engine = VectorEngine(config, log_level=LOG_OFF, seed=seed, profile=profile, propagation=propagation)
+    engine.load_compiled(model_file if isinstance(model_file, CompiledModel) else load_cached(model_file))
+    n = engine.model.n_symbols
+    k = n if k is None else min(k, n)
+    for _ in range(transient):
+        engine.tick()
+    tangent = TangentMap(engine.model, engine.config, profile, propagation, k)
+    engine.slopes = np.ones(n)
+    rng = np.random.default_rng(seed)
+    V = np.linalg.qr(rng.standard_normal((n, k)))[0]
+    logs = []
+    ticks = []
+    done = 0
+    while done < steps:
+        span = min(qr_every, steps - done)
+        for _ in range(span):
+            engine.tick()
+            V = tangent.apply(V, engine.slopes)
+        V, R = np.linalg.qr(V)
+        with np.errstate(divide='ignore'):
+            logs.append(np.log(np.abs(np.diag(R))))
+        ticks.append(span)
+        done += span
+    logs = np.array(logs)
+    ticks = np.array(ticks)
+    exponents = logs.sum(axis=0) / steps
+    # batch means over contiguous blocks of QR intervals
+    parts = np.array_split(np.arange(len(logs)), min(blocks, len(logs)))
+    rates = np.array([logs[p].sum(axis=0) / ticks[p].sum() for p in parts])
+    ends = np.cumsum([len(p) for p in parts]) - 1
+    history = np.cumsum(logs, axis=0)[ends] / np.cumsum(ticks)[ends, None]
+    with np.errstate(invalid='ignore'):
+        stderr = rates.std(axis=0, ddof=1) / np.sqrt(len(rates)) if len(rates) > 1 else np.full(k, np.nan)
+    order = np.argsort(-exponents, kind='stable')
+    return {'exponents': exponents[order], 'stderr': stderr[order], 'history': history[:, order],
+            'steps': steps, 'symbols': n}
+
+def estimate_lyapunov(model_file, steps=100, eps=1e-5, seed=None, store=None, method='tangent'):
+    # largest exponent per tick over all symbols; method 'tangent' (Benettin, one tangent vector)
+    # or 'twin' (perturbed copy renormalized to eps every tick).
+    # store (result_store.ResultStore or path): with a seed, an estimate computed before is read back
+    options = {'eps': eps, 'method': method}
+    with using_store(store) as store:
+        found = store.lookup('lyapunov', model_file, [{}], [seed], steps, options) if store is not None else {}
+        if found:
+            lyap = found[0]['lyapunov']
+        elif method == 'twin':
+            lyap = twin_lyapunov(model_file, steps, eps, seed)
+        else:
+            lyap = float(lyapunov_spectrum(model_file, 1, steps, transient=0, seed=seed)['exponents'][0])
+        if store is not None and not found:
+            store.save('lyapunov', model_file, [{}], [seed], steps, [{'lyapunov': lyap}], options)
+    if lyap is None:
+        print('No divergence')
+        return None
+    if lyap == math.inf:
+        print(f'Run diverged within {steps} steps (exponent reported as inf)')
+        return lyap
+    print(f'Largest Lyapunov exponent per tick over {steps} steps: {lyap}')
+    return lyap
+
+def twin_lyapunov(model_file, steps=100, eps=1e-5, seed=None):
+    # one reference run and its twin, kept at distance eps like lyapunov_chunk (relative to the reference's
+    # norm once that passes 1); a run that diverges is stopped and reported as an infinite exponent
+    engine1 = VectorEngine(log_level=LOG_OFF, seed=seed)
     engine1.load_model(model_file)
-    engine2 = SymbolicEngine()
-    engine2.load_model(model_file)
-    # initial small perturbation on A
-    engine2.symbols['A'].state += eps
-    distances = []
-    for i in range(steps):
-        engine1.tick()
-        engine2.tick()
-        a1 = engine1.symbols['A'].state
-        b1 = engine1.symbols['B'].state
-        a2 = engine2.symbols['A'].state
-        b2 = engine2.symbols['B'].state
-        d = math.sqrt((a1 - a2)**2 + (b1 - b2)**2)
-        distances.append(d)
-        # renormalize to keep perturbation small
-        if d == 0:
-            continue
-        scale = eps / d
-        engine2.symbols['A'].state = a1 + (a2 - a1) * scale
-        engine2.symbols['B'].state = b1 + (b2 - b1) * scale
-    # estimate exponent from log of growth
-    logs = [math.log(max(di, 1e-16)/eps) for di in distances if di>0]
+    # twin starts from the same loaded state and replays the same random draws
+    engine2 = engine1.fork()
+    direction = np.ones(engine1.model.n_symbols) / math.sqrt(engine1.model.n_symbols)
+    scale = eps * max(1.0, float(np.sqrt(engine1.state @ engine1.state)))
+    engine2.state += scale * direction
+    np.copyto(engine2.prev, engine2.state)
+    logs = []
+    # diverging runs overflow on purpose
+    with np.errstate(all='ignore'):
+        for i in range(steps):
+            engine1.tick()
+            engine2.tick()
+            diff = engine2.state - engine1.state
+            d = float(np.sqrt(diff @ diff))
+            if not math.isfinite(d) or not np.isfinite(engine1.state).all():
+                return math.inf
+            if d > 0:
+                logs.append(math.log(d / scale))
+            scale = eps * max(1.0, float(np.sqrt(engine1.state @ engine1.state)))
+            if d == 0:
+                # separation wiped out (fired noise seed): start a fresh perturbation
+                engine2.state[:] = engine1.state + scale * direction
+            else:
+                # renormalize to keep perturbation small
+                engine2.state[:] = engine1.state + diff * (scale / d)
+            np.copyto(engine2.prev, engine2.state)
     if not logs:
-        print('No divergence')
-        return
-    lyap = sum(logs)/len(logs)
-    print(f'Approx Lyapunov exponent (average) per {steps} steps: {lyap/steps}')
+        return None
+    return sum(logs) / len(logs)
+
+def lyapunov_chunk(model_file, points, seeds, steps=1000, eps=1e-6, transient=100, blocks=10, profile='core',
+                   propagation='sequential'):
+    # worker: largest exponent per tick for each point, from twin trajectories in one EnsembleEngine:
+    # rows 0..n-1 are the reference runs, rows n..2n-1 their perturbed twins with the same config and seed
+    # (so the same random draws, generated once per pair). After every tick each twin is pulled back to distance eps of its reference,
+    # relative to the reference's norm once that passes 1 so growing runs do not lose it to rounding.
+    # The error bar is the batch-means standard error over `blocks` time blocks, ci the 95% normal interval.
+    n = len(points)
+    engine = EnsembleEngine(list(points) * 2, seeds=list(seeds) * 2, profile=profile, propagation=propagation)
+    engine.load_model(model_file)
+    for _ in range(transient):
+        engine.tick()
+    direction = np.ones(engine.model.n_symbols) / math.sqrt(engine.model.n_symbols)
+    scale = eps * np.maximum(1.0, np.sqrt((engine.state[:n] ** 2).sum(axis=1)))
+    engine.state[n:] = engine.state[:n] + scale[:, None] * direction
+    engine.prev[n:] = engine.state[n:]
+    logs = np.empty((steps, n))
+    diverged = np.zeros(n, dtype=bool)
+    # diverging runs overflow on purpose, they are reported as an infinite exponent
+    with np.errstate(all='ignore'):
+        for t in range(steps):
+            engine.tick()
+            diff = engine.state[n:] - engine.state[:n]
+            d = np.sqrt((diff * diff).sum(axis=1))
+            diverged |= ~np.isfinite(d) | ~np.isfinite(engine.state[:n]).all(axis=1)
+            # a fired noise seed can wipe out the separation: that tick is skipped and the twin re-perturbed
+            lost = (d == 0) | diverged
+            logs[t] = np.where(lost, np.nan, np.log(d / scale))
+            scale = eps * np.maximum(1.0, np.sqrt((engine.state[:n] ** 2).sum(axis=1)))
+            diff = np.where(lost[:, None], direction, diff / d[:, None]) * scale[:, None]
+            engine.state[n:] = engine.state[:n] + diff
+            engine.prev[n:] = engine.state[n:]
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lyap = np.nanmean(logs, axis=0)
+        rates = np.array([np.nanmean(part, axis=0) for part in np.array_split(logs, min(blocks, steps))])
+        stderr = np.nanstd(rates, axis=0, ddof=1) / np.sqrt(len(rates))
+    lyap[diverged] = np.inf
+    stderr[diverged] = np.nan
+    rows = []
+    for point, l, e, lost in zip(points, lyap.tolist(), stderr.tolist(), diverged.tolist()):
+        ci = (l, l) if lost else (l - 1.96 * e, l + 1.96 * e)
+        rows.append(dict(point, lyapunov=l, stderr=e, ci_low=ci[0], ci_high=ci[1]))
+    return rows
+
+def lyapunov_map(model_file, axes, output_csv='lyapunov_map.csv', steps=1000, seed=None, workers=None, chunk=64,
+                 eps=1e-6, transient=100, blocks=10, profile='core', propagation='sequential', store=None,
+                 common_noise=False):
+    # largest exponent over a parameter grid ({config key: values}), chunks of points spread over a process
+    # pool like run_parallel_scan; point i gets the i-th seed spawned from `seed`. Non-finite exponents mark
+    # runs that diverged. Returns the rows in grid order, also written to output_csv.
+    # common_noise=True runs every point on the same random draws (smoother maps, differences due to the
+    # parameters only).
+    grid = make_grid(axes)
+    seeds = point_seeds(seed, len(grid), common_noise)
+    options = {'eps': eps, 'transient': transient, 'blocks': blocks, 'profile': profile, 'propagation': propagation}
+    rows = [None] * len(grid)
+    for positions, result in evaluate('lyapunov_map', lyapunov_chunk, model_file, grid, seeds, steps, options,
+                                      workers, chunk, store):
+        for p, row in zip(positions, result):
+            rows[p] = row
+    with open(output_csv, 'w', newline='') as csvf:
+        writer = csv.DictWriter(csvf, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    chaotic = sum(1 for row in rows if row['ci_low'] > 0)
+    print(f'Lyapunov map complete, {len(grid)} points, {chaotic} with a positive exponent, wrote {output_csv}')
+    return rows
 
 if __name__ == '__main__':
     estimate_lyapunov('model_v04.json')
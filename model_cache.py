@@ -0,0 +1,133 @@
+import os
+import shutil
+import hashlib
+from collections import OrderedDict
+from model_format import FORMAT_VERSION, is_binary
+from symbolic_vector import read_model, read_binary, save_binary
+
+# bump when compile_model changes what a JSON file compiles to
+COMPILE_VERSION = 1
+DEFAULT_DIR = os.environ.get('SYMBOLIC_MODEL_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'symbolic_physics'))
+
+
+class ModelCache:
+    # Compiled models keyed by the SHA-256 of the JSON file plus the format/compile versions.
+    # A hit in the in-process LRU returns the shared CompiledModel (engines copy only the state);
+    # a hit on disk memory-maps the stored binary model. The directory is trimmed to max_bytes,
+    # least recently used entries first. Binary model files are read directly, they need no compiling.
+    def __init__(self, directory=DEFAULT_DIR, max_entries=16, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.models = OrderedDict()
+        self.keys = {}  # (path, mtime, size) -> key, so unchanged files are hashed once per process
+
+    def key(self, path):
+        # a binary model directory hashes its array files in name order
+        files = sorted(e.path for e in os.scandir(path) if e.is_file()) if os.path.isdir(path) else [path]
+        stamp = tuple((os.path.abspath(f), st.st_mtime_ns, st.st_size) for f in files for st in [os.stat(f)])
+        if stamp not in self.keys:
+            h = hashlib.sha256(f'v{FORMAT_VERSION}.{COMPILE_VERSION}:'.encode())
+            for name in files:
+                with open(name, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        h.update(block)
+            self.keys[stamp] = h.hexdigest()
+        return self.keys[stamp]
+
+    def load(self, path):
+        if is_binary(path):
+            return read_model(path)
+        key = self.key(path)
+        if key in self.models:
+            self.models.move_to_end(key)
+            return self.models[key]
+        model = self.load_disk(key)
+        if model is None:
+            model = read_model(path)
+            self.store_disk(key, model)
+        self.models[key] = model
+        while len(self.models) > self.max_entries:
+            self.models.popitem(last=False)
+        return model
+
+    def entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def load_disk(self, key):
+        if self.directory is None or not os.path.isdir(self.entry(key)):
+            return None
+        try:
+            model = read_binary(self.entry(key))
+            os.utime(self.entry(key))
+            return model
+        except (OSError, ValueError):
+            # damaged entry: drop it and recompile
+            shutil.rmtree(self.entry(key), ignore_errors=True)
+            return None
+
+    def store_disk(self, key, model):
+        # written under a temporary name and renamed, so concurrent processes never see half an entry
+        if self.directory is None:
+            return
+        tmp = self.entry(f'{key}.tmp{os.getpid()}')
+        try:
+            save_binary(model, tmp)
+            os.replace(tmp, self.entry(key))
+        except OSError:
+            # read-only or full cache directory: keep working from memory
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def disk_entries(self):
+        # compiled model directories plus the PCA bases projection.py stores alongside (pca-*.npz)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = self.entry(name)
+            if '.tmp' in name:
+                continue
+            if os.path.isdir(path):
+                size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+            elif name.startswith('pca-') and name.endswith('.npz'):
+                size = os.stat(path).st_size
+            else:
+                continue
+            entries.append((os.stat(path).st_mtime, size, path))
+        return sorted(entries)
+
+    def remove(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        entries = self.disk_entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def clear(self):
+        self.models.clear()
+        self.keys.clear()
+        if self.directory is not None and os.path.isdir(self.directory):
+            for mtime, size, path in self.disk_entries():
+                self.remove(path)
+
+
+default_cache = ModelCache()
+
+
+def load_cached(path):
+    return default_cache.load(path)
+
+
+def model_hash(path):
+    return default_cache.key(path)
@@ -0,0 +1,60 @@
+import os
+import json
+import numpy as np
+
+# Binary model format: the JSON schema as flat arrays.
+#   names (str), name_order (argsort of names), states (float),
+#   link_from / link_to (int), link_weight (float), link_type (int8 code into LINK_TYPE_NAMES),
+#   mod_target (int, symbol index), mod_rule (str)
+# Stored either as a directory of .npy files (memory-mapped on load, no copy) or as one .npz archive.
+FORMAT_VERSION = 1
+LINK_TYPE_NAMES = ('bind', 'cycle')
+ARRAYS = ('names', 'name_order', 'states', 'link_from', 'link_to', 'link_weight', 'link_type', 'mod_target', 'mod_rule')
+
+
+def is_binary(path):
+    path = os.fspath(path)
+    return path.endswith('.npz') or os.path.isdir(path)
+
+
+def write_arrays(path, arrays, compress=False):
+    # path ending in .npz writes one archive, anything else a directory of .npy files
+    path = os.fspath(path)
+    meta = {'format': 'symbolic-model', 'version': FORMAT_VERSION, 'link_types': list(LINK_TYPE_NAMES),
+            'n_symbols': len(arrays['names']), 'n_links': len(arrays['link_from'])}
+    if path.endswith('.npz'):
+        save = np.savez_compressed if compress else np.savez
+        save(path, meta=json.dumps(meta), **{k: arrays[k] for k in ARRAYS})
+        return
+    os.makedirs(path, exist_ok=True)
+    for k in ARRAYS:
+        np.save(os.path.join(path, k + '.npy'), arrays[k])
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def read_arrays(path, mmap=True):
+    # directory arrays come back as read-only np.memmap views of the files; .npz members are read into memory
+    path = os.fspath(path)
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            arrays = {k: data[k] for k in ARRAYS}
+    else:
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {k: np.load(os.path.join(path, k + '.npy'), mmap_mode='r' if mmap else None) for k in ARRAYS}
+    if meta.get('format') != 'symbolic-model' or meta.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f'{path} is not a supported binary model (version {meta.get("version")})')
+    return arrays
+
+
+def arrays_to_data(arrays):
+    # JSON model schema, for the object engine and for converting back to .json
+    names = arrays['names'].tolist()
+    return {'symbols': [{'name': n, 'state': x} for n, x in zip(names, arrays['states'].tolist())],
+            'links': [{'from': names[a], 'to': names[b], 'weight': w, 'type': LINK_TYPE_NAMES[t]}
+                      for a, b, w, t in zip(arrays['link_from'].tolist(), arrays['link_to'].tolist(),
+                                            arrays['link_weight'].tolist(), arrays['link_type'].tolist())],
+            'modifiers': [{'target': names[t], 'rule': r}
+                          for t, r in zip(arrays['mod_target'].tolist(), arrays['mod_rule'].tolist())]}
@@ -0,0 +1,141 @@
+import numpy as np
+import noise
+from event_log import INVERT, THRESHOLD_INVERT, RANDOM_INVERT, NOISE_SEED, BACKGROUND_NOISE
+
+# Kernels work on all targets of one rule at once:
+#   kernel(x, u, config) -> (new_x, fired, value)
+# x holds the current target states, shape (..., m); u the rule's uniforms, shape (..., draws, m);
+# config values are scalars or per-replica (N, 1) columns, so one kernel serves VectorEngine and
+# EnsembleEngine. fired marks the targets the rule acted on, value is an optional per-target number
+# for the event log (None when the rule has none).
+# Slopes give d new_x / d x per target for tangent-space propagation (lyapunov.py):
+#   slope(x, u, config, new, fired) -> array like x
+# Rules registered without one are differentiated numerically.
+
+
+class ModifierRule:
+    def __init__(self, name, kernel, draws=0, kind=None, slope=None):
+        self.name = name
+        self.kernel = kernel
+        self.draws = draws
+        self.kind = kind
+        self.slope = slope
+
+    def derivative(self, x, u, config, new, fired):
+        if self.slope is not None:
+            return self.slope(x, u, config, new, fired)
+        # one-sided difference under the same draws
+        h = 1e-7 * np.maximum(1.0, np.abs(x))
+        return (self.kernel(x + h, u, config)[0] - new) / h
+
+
+RULES = {}
+
+
+def register_modifier(name, kernel, draws=0, kind=None, slope=None):
+    # register before loading models that use the rule: its draws are part of the noise layout
+    RULES[name] = ModifierRule(name, kernel, draws, kind, slope)
+    noise.RULE_DRAWS[name] = draws
+
+
+def signs(u):
+    return np.where(u < 0.5, -1.0, 1.0)
+
+
+def invert_kernel(x, u, config):
+    return np.where(x == 0.0, signs(u[..., 0, :]), -x), np.ones(x.shape, dtype=bool), None
+
+
+def threshold_invert_kernel(x, u, config):
+    fired = x > 0
+    return np.where(fired, -x, x), fired, None
+
+
+def random_invert_kernel(x, u, config):
+    fired = u[..., 0, :] < config['random_invert_p']
+    new = np.where(x == 0.0, signs(u[..., 1, :]), -x)
+    return np.where(fired, new, x), fired, None
+
+
+def noise_seed_kernel(x, u, config):
+    zero = (x == 0.0) | (np.abs(x) < config.get('noise_seed_tol', 0.0))
+    fired = zero & (u[..., 0, :] < config['noise_seed_p'])
+    return np.where(fired, signs(u[..., 1, :]), x), fired, None
+
+
+def background_noise_kernel(x, u, config):
+    amp = config['background_noise_amp']
+    delta = -amp + (amp + amp) * u[..., 0, :]
+    return x + delta, np.ones(x.shape, dtype=bool), delta
+
+
+def flip_slope(x, u, config, new, fired):
+    return np.full(x.shape, -1.0)
+
+
+def flip_fired_slope(x, u, config, new, fired):
+    return np.where(fired, -1.0, 1.0)
+
+
+def reset_fired_slope(x, u, config, new, fired):
+    # a fired noise seed sets the state to a constant
+    return np.where(fired, 0.0, 1.0)
+
+
+def shift_slope(x, u, config, new, fired):
+    return np.ones(x.shape)
+
+
+register_modifier('invert', invert_kernel, 1, INVERT, flip_slope)
+register_modifier('threshold_invert', threshold_invert_kernel, 0, THRESHOLD_INVERT, flip_fired_slope)
+register_modifier('random_invert', random_invert_kernel, 2, RANDOM_INVERT, flip_fired_slope)
+register_modifier('noise_seed', noise_seed_kernel, 2, NOISE_SEED, reset_fired_slope)
+register_modifier('background_noise', background_noise_kernel, 1, BACKGROUND_NOISE, shift_slope)
+BUILTIN_RULES = tuple(RULES)
+
+
+def available(rule, builtin=None):
+    # whether an engine whose profile knows the built-in rules `builtin` (default all) applies `rule`;
+    # custom registered rules always apply
+    return rule in RULES and (builtin is None or rule not in BUILTIN_RULES or rule in builtin)
+
+
+class ModifierGroup:
+    def __init__(self, rule, pos, idx, cols):
+        self.rule = rule
+        self.pos = pos    # positions in the modifier list, for event ordering
+        self.idx = idx    # target symbol indices
+        self.cols = cols  # (draws, m) columns of the tick's noise row
+
+
+def compile_modifiers(modifiers, index, layout, builtin=None):
+    # Split the modifier list into stages in which no symbol is targeted twice, then group each stage
+    # by rule. Applying stage after stage gives the same result as the sequential per-modifier loop.
+    # builtin: the built-in rules the engine profile knows (default all); custom registered rules always apply.
+    # Returns (stages, unknown) where unknown lists modifiers whose rule is not available.
+    stages = []
+    unknown = []
+    current = {}
+    touched = set()
+    for k, m in enumerate(modifiers):
+        if not available(m.rule, builtin):
+            unknown.append(m)
+            continue
+        t = index[m.target]
+        if t in touched:
+            stages.append(current)
+            current = {}
+            touched = set()
+        touched.add(t)
+        current.setdefault(m.rule, []).append(k)
+    if current:
+        stages.append(current)
+    compiled = []
+    for stage in stages:
+        groups = []
+        for rule, members in stage.items():
+            cols = np.array([layout.cols[k] for k in members], dtype=np.int64).reshape(len(members), RULES[rule].draws).T
+            idx = np.array([index[modifiers[k].target] for k in members], dtype=np.int64)
+            groups.append(ModifierGroup(RULES[rule], np.array(members), idx, cols))
+        compiled.append(groups)
+    return compiled, unknown
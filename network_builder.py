@@ -1,9 +1,13 @@
 
 import json
-from symbolic_core import SymbolicEngine
+from symbolic_core import SymbolicEngine, Modifier
+from symbolic_vector import CompiledModel, BIND, CYCLE, compile_model, save_binary
+from result_store import using_store
+import numpy as np
 import random
 
-def make_random_network(n=5):
+def make_random_network(n=5, path='random_net.json'):
+    # path ending in .json writes the JSON schema, anything else the binary format (.npz or .npy directory)
     symbols = [{'name': f'S{i}', 'state': random.uniform(-1,1)} for i in range(n)]
     links = []
     for i in range(n):
@@ -19,17 +23,41 @@ def make_random_network(n=5):
     modifiers.append({'target':'S0','rule':'noise_seed'})
     modifiers.append({'target':'S1','rule':'background_noise'})
     model = {'symbols':symbols,'links':links,'modifiers':modifiers}
-    with open('random_net.json','w',encoding='utf-8') as f:
-        json.dump(model,f,indent=2)
-    print('Created random_net.json with',n,'symbols')
+    if path.endswith('.json'):
+        with open(path,'w',encoding='utf-8') as f:
+            json.dump(model,f,indent=2)
+    else:
+        save_binary(compile_model(model), path)
+    print('Created',path,'with',n,'symbols')
 
-def simulate_and_summary(model_file, steps=100):
-    engine = SymbolicEngine()
+def make_random_arrays(n=1000000, links_per_symbol=10, seed=None):
+    # same kind of network as make_random_network, built directly as arrays for very large n
+    rng = np.random.default_rng(seed)
+    m = n * links_per_symbol
+    link_from = rng.integers(0, n, m)
+    link_to = rng.integers(0, n - 1, m)
+    link_to += link_to >= link_from  # no self links
+    link_type = np.where(rng.random(m) < 0.5, BIND, CYCLE)
+    link_weight = rng.uniform(0.5, 1.5, m)
+    names = np.char.add('S', np.arange(n).astype(str))
+    modifiers = [Modifier('S0', 'random_invert'), Modifier('S0', 'noise_seed'), Modifier('S1', 'background_noise')]
+    return CompiledModel(names, rng.uniform(-1, 1, n), link_from, link_to, link_weight, link_type, modifiers)
+
+def simulate_and_summary(model_file, steps=100, seed=None, store=None):
+    # store (result_store.ResultStore or path): with a seed, a summary computed before is read back
+    engine = SymbolicEngine(seed=seed)
     engine.load_model(model_file)
-    for _ in range(steps):
-        engine.tick()
-    # summary: average absolute states
-    avg = sum(abs(s.state) for s in engine.symbols.values())/len(engine.symbols)
+    with using_store(store) as store:
+        found = store.lookup('summary', model_file, [{}], [seed], steps) if store is not None else {}
+        if found:
+            avg = found[0]['avg_magnitude']
+        else:
+            for _ in range(steps):
+                engine.tick()
+            # summary: average absolute states
+            avg = sum(abs(s.state) for s in engine.symbols.values())/len(engine.symbols)
+            if store is not None:
+                store.save('summary', model_file, [{}], [seed], steps, [{'avg_magnitude': avg}])
     print('Average magnitude of state:',avg)
     # list connections
     print('Links:',[(l.from_symbol,l.to_symbol,l.type) for l in engine.links])
@@ -0,0 +1,84 @@
+import numpy as np
+
+# uniforms consumed per target each tick, by modifier rule
+RULE_DRAWS = {
+    'invert': 1,            # sign when the state is exactly zero
+    'threshold_invert': 0,
+    'random_invert': 2,     # fire test, sign
+    'noise_seed': 2,        # fire test, sign
+    'background_noise': 1,  # amplitude
+}
+
+
+class NoiseLayout:
+    # Column layout of one tick's uniforms: grouped by rule type (so a group is a contiguous
+    # (draws x members) block), followed by one base-noise column per symbol.
+    def __init__(self, rules, n_base=0):
+        # rules[k] is the rule of modifier k, or None for a modifier that can never fire
+        self.cols = [()] * len(rules)
+        self.groups = {}
+        col = 0
+        for rule, draws in RULE_DRAWS.items():
+            members = [k for k, r in enumerate(rules) if r == rule]
+            for i, k in enumerate(members):
+                self.cols[k] = tuple(col + j * len(members) + i for j in range(draws))
+            self.groups[rule] = (members, slice(col, col + draws * len(members)))
+            col += draws * len(members)
+        self.base = slice(col, col + n_base)
+        self.width = col + n_base
+
+
+class NoiseStream:
+    # Per-engine numpy Generator handing out one row of uniforms per tick. Rows are drawn a block at a
+    # time in a single call; the values depend only on the seed and the layout, never on the block size.
+    # Wide rows (base noise on huge models) get fewer rows per block so a block stays near `budget` values.
+    def __init__(self, seed=None, block=256, budget=1 << 20):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.block = block
+        self.budget = budget
+        self.layout = NoiseLayout([])
+        self.buf = np.empty((0, 0))
+        self.pos = 0
+
+    def configure(self, layout):
+        self.layout = layout
+        self.buf = np.empty((0, layout.width))
+        self.pos = 0
+
+    def next(self):
+        if self.pos >= len(self.buf):
+            rows = max(1, min(self.block, self.budget // max(1, self.layout.width)))
+            self.buf = self.rng.random((rows, self.layout.width))
+            self.pos = 0
+        row = self.buf[self.pos]
+        self.pos += 1
+        return row
+
+    def get_state(self):
+        # generator state plus the not yet consumed rows of the current block
+        return {'bit_generator': self.rng.bit_generator.state, 'buf': self.buf[self.pos:].copy()}
+
+    def set_state(self, state):
+        self.rng.bit_generator.state = state['bit_generator']
+        self.buf = np.array(state['buf'], dtype=float)
+        self.pos = 0
+
+    def clone(self):
+        other = NoiseStream(self.seed, self.block, self.budget)
+        other.layout = self.layout
+        other.set_state(self.get_state())
+        return other
+
+
+def seed_key(seed):
+    # equal keys mean equal random streams; None (fresh OS entropy) and generator objects never match anything
+    if isinstance(seed, np.random.SeedSequence):
+        return ('sequence', str(seed.entropy), tuple(seed.spawn_key), seed.pool_size)
+    if isinstance(seed, (int, np.integer)) and not isinstance(seed, bool):
+        return ('int', int(seed))
+    return None
+
+
+def sign(u):
+    return -1.0 if u < 0.5 else 1.0
@@ -1,39 +1,187 @@
-
 import itertools
 import json
 import csv
-from symbolic_core import SymbolicEngine
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ensemble import EnsembleEngine
+from accumulators import MetricSet, Welford, MinMax, ZeroCrossings
+from attractors import TailWindow, regime_columns
+from result_store import using_store
 import os
 
-def run_scan(model_file, output_csv='param_scan.csv'):
-    # parameter grid
-    decay_rates = [0.8, 0.9, 0.95]
-    bind_coeffs = [0.05, 0.1, 0.2]
-    cycle_coeffs = [0.2, 0.5, 0.8]
-    results = []
-    for dr, bc, cc in itertools.product(decay_rates, bind_coeffs, cycle_coeffs):
-        config = {'decay_rate':dr, 'bind_coeff':bc, 'cycle_coeff':cc,
-                  'random_invert_p':0.3,'noise_seed_p':0.2,'background_noise_amp':0.05}
-        engine = SymbolicEngine(config=config)
-        engine.load_model(model_file)
-        # run short simulation
-        for _ in range(100):
-            engine.tick()
-        # compute metrics: variance of A and B
-        A_vals = [float(line.split('States: ')[1].split(',')[0].split('=')[1]) 
-                  for line in engine.log if 'States:' in line]
-        B_vals = [float(line.split('States: ')[1].split(',')[1].split('=')[1]) 
-                  for line in engine.log if 'States:' in line]
-        varA = sum((x - sum(A_vals)/len(A_vals))**2 for x in A_vals)/len(A_vals) if A_vals else 0
-        varB = sum((x - sum(B_vals)/len(B_vals))**2 for x in B_vals)/len(B_vals) if B_vals else 0
-        results.append({'decay_rate':dr,'bind_coeff':bc,'cycle_coeff':cc,'varA':varA,'varB':varB})
-    # write CSV
-    with open(output_csv,'w',newline='') as csvf:
-        writer = csv.DictWriter(csvf, fieldnames=['decay_rate','bind_coeff','cycle_coeff','varA','varB'])
-        writer.writeheader()
-        for r in results:
-            writer.writerow(r)
-    print(f'Scan complete, wrote {output_csv}')
+# the classic 27-point grid of run_scan
+DEFAULT_AXES = {'decay_rate': [0.8, 0.9, 0.95], 'bind_coeff': [0.05, 0.1, 0.2], 'cycle_coeff': [0.2, 0.5, 0.8]}
+
+
+def point_seeds(seed, n, common_noise=False):
+    # one seed per point, or one seed shared by all points (common random numbers)
+    seq = np.random.SeedSequence(seed)
+    return [seq] * n if common_noise else seq.spawn(n)
+
+
+def make_grid(axes):
+    # axes: {config key: values}; returns one config dict per point of the product grid
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+
+def scan_chunk(model_file, points, seeds, steps=100, monitor=None, profile='core', symbols=None, stats=('var',),
+               regime=False):
+    # worker: one EnsembleEngine over a chunk of grid points, returns one result row per point.
+    # Replicas are independent, so a point's result does not depend on the chunk it ran in
+    # (except with a monitor, which stops a chunk once all of its points have settled).
+    # symbols: names to measure (default the first two, 'all' for every symbol); stats: columns per symbol,
+    # any of mean/var/std/min/max/zero_crossing_rate, accumulated online so no trajectory is kept.
+    # regime=True adds the attractor class of each point (attractors.py) from the last WINDOW ticks of the symbols.
+    engine = EnsembleEngine(points, seeds=seeds, profile=profile)
+    engine.load_model(model_file)
+    names = engine.model.names
+    symbols = [str(n) for n in (names[:2] if symbols is None else names if symbols == 'all' else symbols)]
+    metrics = MetricSet(Welford(symbols), MinMax(symbols), ZeroCrossings(symbols))
+    if regime:
+        window = TailWindow(symbols)
+        metrics.accumulators.append(window)
+    engine.run(steps, record=[], callback=metrics, monitor=monitor)
+    cols = metrics.columns(stats)
+    if regime:
+        cols.update(regime_columns(window))
+    return [dict(point, **{k: v[i] for k, v in cols.items()}) for i, point in enumerate(points)]
+
+
+def evaluate(kind, worker, model_file, points, seeds, steps, options, workers=None, chunk=64, store=None,
+             counts=None):
+    # yields (positions in points, result rows) per chunk as chunks finish; the rows come from
+    # worker(model_file, chunk points, chunk seeds, steps, **options). workers=1 runs in this process.
+    # store (result_store.ResultStore or path): points found there under (kind, options) come first in one
+    # batch, only the missing ones are simulated and then added.
+    # counts: optional dict, its 'stored' and 'simulated' entries are increased by the points yielded of each
+    if counts is not None:
+        counts.setdefault('stored', 0)
+        counts.setdefault('simulated', 0)
+    if store is not None:
+        with using_store(store) as store:
+            found = store.lookup(kind, model_file, points, seeds, steps, options)
+            if counts is not None:
+                counts['stored'] += len(found)
+            if found:
+                positions = sorted(found)
+                yield positions, [dict(points[i], **found[i]) for i in positions]
+            missing = [i for i in range(len(points)) if i not in found]
+            for positions, rows in evaluate(kind, worker, model_file, [points[i] for i in missing],
+                                            [seeds[i] for i in missing], steps, options, workers, chunk,
+                                            counts=counts):
+                positions = [missing[p] for p in positions]
+                store.save(kind, model_file, [points[i] for i in positions], [seeds[i] for i in positions], steps,
+                           [{k: v for k, v in row.items() if k not in points[i]} for i, row in zip(positions, rows)],
+                           options)
+                yield positions, rows
+            return
+    chunks = [list(range(i, min(i + chunk, len(points)))) for i in range(0, len(points), chunk)]
+    jobs = [(model_file, [points[i] for i in c], [seeds[i] for i in c], steps) for c in chunks]
+    if workers == 1:
+        for c, job in zip(chunks, jobs):
+            rows = worker(*job, **options)
+            if counts is not None:
+                counts['simulated'] += len(c)
+            yield c, rows
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(worker, *job, **options): c for c, job in zip(chunks, jobs)}
+            for future in as_completed(futures):
+                rows = future.result()
+                if counts is not None:
+                    counts['simulated'] += len(futures[future])
+                yield futures[future], rows
+
+
+def evaluate_points(model_file, points, seeds, steps=100, workers=None, chunk=64, monitor=None, profile='core',
+                    symbols=None, stats=('var',), store=None, regime=False, counts=None):
+    # scan_chunk over any list of points, see evaluate(). Runs with a monitor are not stored, a stopped
+    # chunk's results depend on the other points in it.
+    options = {'profile': profile, 'symbols': symbols, 'stats': list(stats)}
+    if regime:
+        # only set when asked, so results stored without it keep their keys
+        options['regime'] = True
+    if monitor is not None:
+        return evaluate('scan', scan_chunk, model_file, points, seeds, steps, dict(options, monitor=monitor),
+                        workers, chunk, counts=counts)
+    return evaluate('scan', scan_chunk, model_file, points, seeds, steps, options, workers, chunk, store, counts)
+
+
+def run_parallel_scan(model_file, axes, output_csv='param_scan.csv', steps=100, seed=None, workers=None,
+                      chunk=64, resume=True, monitor=None, profile='core', symbols=None, stats=('var',), store=None,
+                      common_noise=False, regime=False):
+    # Spreads the grid over a process pool in chunks of `chunk` points and appends each finished chunk to
+    # output_csv. With resume=True, points already in the CSV are skipped, so an interrupted scan continues
+    # where it stopped (pass the same axes and seed: point i always gets the i-th spawned seed).
+    # workers=1 runs in this process. With a store, points computed by any earlier scan are taken from it.
+    # common_noise=True gives every point the same random draws, so differences between points come from
+    # the parameters alone. regime=True adds regime, period and attractor feature columns; cluster the
+    # finished CSV with attractors.cluster_scan().
+    grid = make_grid(axes)
+    keys = list(axes)
+    seeds = point_seeds(seed, len(grid), common_noise)
+    done = set()
+    fields = None
+    if resume and os.path.exists(output_csv):
+        with open(output_csv, newline='') as csvf:
+            reader = csv.DictReader(csvf)
+            fields = reader.fieldnames
+            if fields and not set(keys) <= set(fields):
+                raise ValueError(f'{output_csv} was written by a scan over other parameters')
+            done = {tuple(row[k] for k in keys) for row in reader}
+    todo = [i for i, p in enumerate(grid) if tuple(str(p[k]) for k in keys) not in done]
+    counts = {}
+    results = evaluate_points(model_file, [grid[i] for i in todo], [seeds[i] for i in todo], steps, workers, chunk,
+                              monitor, profile, symbols, stats, store, regime, counts)
+
+    with open(output_csv, 'a' if fields else 'w', newline='') as csvf:
+        writer = None
+
+        def write(rows):
+            nonlocal writer, fields
+            if writer is None:
+                fields = fields or list(rows[0])
+                writer = csv.DictWriter(csvf, fieldnames=fields)
+                if csvf.tell() == 0:
+                    writer.writeheader()
+            writer.writerows(rows)
+            csvf.flush()
+
+        for positions, rows in results:
+            write(rows)
+    print(f'Scan complete, {len(grid)} points: {counts["simulated"]} simulated, {counts["stored"]} from the store, '
+          f'{len(grid) - len(todo)} already in the CSV, wrote {output_csv}')
+
+
+def compare_configs(model_file, config_a, config_b, replicas=32, steps=100, seed=None, symbols=None, stat='var',
+                    common_noise=True, profile='core'):
+    # A/B comparison of one statistic per symbol over `replicas` paired runs in one ensemble. With
+    # common_noise, run i of A and run i of B share their random draws, so the paired differences carry
+    # only the effect of the config change and the error bar shrinks accordingly.
+    # Returns {column: {'a': mean, 'b': mean, 'diff': mean of b - a, 'stderr': standard error of diff}}.
+    seq = np.random.SeedSequence(seed)
+    seeds_a = seq.spawn(replicas)
+    seeds_b = seeds_a if common_noise else seq.spawn(replicas)
+    engine = EnsembleEngine([config_a] * replicas + [config_b] * replicas, seeds=seeds_a + seeds_b, profile=profile)
+    engine.load_model(model_file)
+    names = engine.model.names
+    symbols = [str(n) for n in (names[:2] if symbols is None else names if symbols == 'all' else symbols)]
+    metrics = MetricSet(Welford(symbols), MinMax(symbols), ZeroCrossings(symbols))
+    engine.run(steps, record=[], callback=metrics)
+    out = {}
+    for column, values in metrics.columns((stat,)).items():
+        a, b = np.array(values[:replicas]), np.array(values[replicas:])
+        diff = b - a
+        out[column] = {'a': a.mean(), 'b': b.mean(), 'diff': diff.mean(),
+                       'stderr': diff.std(ddof=1) / np.sqrt(replicas) if replicas > 1 else np.nan}
+    return out
+
+
+def run_scan(model_file, output_csv='param_scan.csv', steps=100, seed=None, monitor=None, store=None):
+    # all 27 grid points run as replicas of one ensemble
+    run_parallel_scan(model_file, DEFAULT_AXES, output_csv, steps, seed, workers=1, chunk=27, resume=False,
+                      monitor=monitor, store=store)
 
 if __name__ == '__main__':
     run_scan('model_v04.json')
@@ -1,30 +1,258 @@
-
 import matplotlib.pyplot as plt
-from symbolic_core import SymbolicEngine
+import numpy as np
+from symbolic_core import SymbolicEngine, LOG_OFF
+from backends import make_engine
+from sinks import iter_trajectory
+from projection import model_basis, chunk_rows
 import json
 
-def run_and_plot(model_file, steps=200):
-    engine = SymbolicEngine()
+def run_and_plot(model_file, steps=200, x='A', y='B'):
+    engine = SymbolicEngine(log_level=LOG_OFF)
     engine.load_model(model_file)
-    A_vals = []
-    B_vals = []
-    for _ in range(steps):
-        engine.tick()
-        A_vals.append(engine.symbols['A'].state)
-        B_vals.append(engine.symbols['B'].state)
+    traj = engine.run(steps, record=[x, y])
+    A_vals = traj[:, 0]
+    B_vals = traj[:, 1]
     plt.figure()
-    plt.plot(A_vals, label='A')
-    plt.plot(B_vals, label='B')
+    plt.plot(A_vals, label=x)
+    plt.plot(B_vals, label=y)
     plt.legend()
-    plt.title('Time series A and B')
+    plt.title(f'Time series {x} and {y}')
     plt.savefig('time_series.png')
     plt.figure()
     plt.scatter(A_vals, B_vals, s=5)
-    plt.title('Phase space A vs B')
-    plt.xlabel('A')
-    plt.ylabel('B')
+    plt.title(f'Phase space {x} vs {y}')
+    plt.xlabel(x)
+    plt.ylabel(y)
     plt.savefig('phase_space.png')
     print('Saved phase_space.png and time_series.png')
 
+# Long trajectories (10^7 steps and more) are rendered from fixed-size summaries fed chunk by chunk:
+# a 2D density histogram for the phase portrait and min/max envelopes for the time series. Memory and
+# rendering time do not grow with the trajectory length.
+
+LIMIT = 1e300
+
+class PhaseDensity:
+    # bins x bins counts of (x, y) points. Without a fixed range the box starts around the first chunk and
+    # doubles towards points that fall outside (pairs of bins merge, so no count is lost or moved).
+    def __init__(self, bins=512, x_range=None, y_range=None):
+        self.bins = bins + bins % 2
+        self.counts = np.zeros((self.bins, self.bins), dtype=np.int64)
+        self.fixed = [x_range is not None, y_range is not None]
+        self.lo = [r[0] if r is not None else None for r in (x_range, y_range)]
+        self.width = [r[1] - r[0] if r is not None else None for r in (x_range, y_range)]
+        self.outside = 0  # points outside a fixed range or beyond LIMIT
+
+    def update(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        # values of diverged runs would stretch the box to overflow
+        keep = (np.abs(x) < LIMIT) & (np.abs(y) < LIMIT)
+        for axis, v in enumerate((x, y)):
+            if self.fixed[axis]:
+                keep &= (v >= self.lo[axis]) & (v <= self.lo[axis] + self.width[axis])
+        self.outside += int(len(x) - keep.sum())
+        x, y = x[keep], y[keep]
+        if not len(x):
+            return
+        for axis, v in enumerate((x, y)):
+            if not self.fixed[axis]:
+                self.cover(axis, v.min(), v.max())
+        ix = self.index(0, x)
+        iy = self.index(1, y)
+        self.counts += np.bincount(ix * self.bins + iy, minlength=self.bins * self.bins).reshape(self.bins, self.bins)
+
+    def index(self, axis, v):
+        i = ((v - self.lo[axis]) / self.width[axis] * self.bins).astype(np.int64)
+        return np.clip(i, 0, self.bins - 1)
+
+    def cover(self, axis, vmin, vmax):
+        if self.lo[axis] is None:
+            self.lo[axis] = vmin
+            self.width[axis] = max(vmax - vmin, 1e-12 * max(1.0, abs(vmin)))
+            return
+        while vmin < self.lo[axis] or vmax > self.lo[axis] + self.width[axis]:
+            down = vmin < self.lo[axis]
+            half = self.bins // 2
+            counts = np.moveaxis(self.counts, axis, 0)
+            merged = counts.reshape(half, 2, *counts.shape[1:]).sum(axis=1)
+            new = np.zeros_like(counts)
+            if down:
+                new[half:] = merged
+            else:
+                new[:half] = merged
+            self.counts = np.moveaxis(new, 0, axis)
+            if down:
+                self.lo[axis] -= self.width[axis]
+            self.width[axis] *= 2
+
+    def extent(self):
+        return [self.lo[0], self.lo[0] + self.width[0], self.lo[1], self.lo[1] + self.width[1]]
+
+    def render(self, path, xlabel='A', ylabel='B', title=None):
+        fig, ax = plt.subplots()
+        if self.lo[0] is not None:
+            ax.imshow(np.log1p(self.counts.T), origin='lower', extent=self.extent(), aspect='auto', cmap='magma',
+                      interpolation='nearest')
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title(title or f'Phase space {xlabel} vs {ylabel} (log density)')
+        fig.savefig(path)
+        plt.close(fig)
+
+class SeriesEnvelope:
+    # min and max of each series per time bucket; buckets double in length whenever more than
+    # 2 * columns are full, so at most that many are ever kept. Like PhaseDensity, values that are not
+    # finite or beyond LIMIT are left out (a bucket holding only such values is NaN, a gap in the plot).
+    def __init__(self, columns=2000):
+        self.columns = columns
+        self.size = 1
+        self.lo = None
+        self.hi = None
+        self.part = None   # (min, max, samples) of the bucket being filled
+        self.count = 0
+        self.outside = 0   # values left out
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[:, None]
+        if not len(values):
+            return
+        keep = np.abs(values) < LIMIT
+        if not keep.all():
+            self.outside += int(keep.size - keep.sum())
+            values = np.where(keep, values, np.nan)
+        if self.lo is None:
+            self.lo = np.zeros((0, values.shape[1]))
+            self.hi = np.zeros((0, values.shape[1]))
+        self.count += len(values)
+        if self.part is not None:
+            take = self.size - self.part[2]
+            head, values = values[:take], values[take:]
+            self.part = (np.fmin(self.part[0], np.fmin.reduce(head)), np.fmax(self.part[1], np.fmax.reduce(head)),
+                         self.part[2] + len(head))
+            if self.part[2] == self.size:
+                self.push(self.part[0][None], self.part[1][None])
+                self.part = None
+        full = len(values) // self.size * self.size
+        if full:
+            blocks = values[:full].reshape(-1, self.size, values.shape[1])
+            self.push(np.fmin.reduce(blocks, axis=1), np.fmax.reduce(blocks, axis=1))
+        if full < len(values):
+            rest = values[full:]
+            if self.part is None:
+                self.part = (np.fmin.reduce(rest), np.fmax.reduce(rest), len(rest))
+            else:
+                # push() left a longer bucket open, the rest continues it
+                self.part = (np.fmin(self.part[0], np.fmin.reduce(rest)), np.fmax(self.part[1], np.fmax.reduce(rest)),
+                             self.part[2] + len(rest))
+            if self.part[2] == self.size:
+                self.push(self.part[0][None], self.part[1][None])
+                self.part = None
+
+    def push(self, lo, hi):
+        self.lo = np.concatenate([self.lo, lo])
+        self.hi = np.concatenate([self.hi, hi])
+        while len(self.lo) > 2 * self.columns:
+            if len(self.lo) % 2:
+                # odd bucket out joins the one being filled, which is now twice as long
+                last_lo, last_hi = self.lo[-1], self.hi[-1]
+                self.lo, self.hi = self.lo[:-1], self.hi[:-1]
+                if self.part is None:
+                    self.part = (last_lo, last_hi, self.size)
+                else:
+                    self.part = (np.fmin(last_lo, self.part[0]), np.fmax(last_hi, self.part[1]),
+                                 self.size + self.part[2])
+            self.lo = np.fmin(self.lo[0::2], self.lo[1::2])
+            self.hi = np.fmax(self.hi[0::2], self.hi[1::2])
+            self.size *= 2
+
+    def envelope(self):
+        # (bucket start sample, min, max) including the bucket still being filled
+        lo, hi = self.lo, self.hi
+        if self.part is not None:
+            lo = np.concatenate([lo, self.part[0][None]])
+            hi = np.concatenate([hi, self.part[1][None]])
+        return np.arange(len(lo)) * self.size, lo, hi
+
+    def render(self, path, labels, every=1, title=None):
+        t, lo, hi = self.envelope()
+        fig, ax = plt.subplots()
+        for k, label in enumerate(labels):
+            ax.fill_between(t * every, lo[:, k], hi[:, k], step='post', alpha=0.6, label=label, linewidth=0.5)
+        ax.legend()
+        ax.set_xlabel('step')
+        ax.set_title(title or f'Time series {" and ".join(labels)} (min/max per {self.size * every} steps)')
+        fig.savefig(path)
+        plt.close(fig)
+
+def plot_chunks(chunks, x='A', y='B', bins=512, columns=2000, x_range=None, y_range=None, every=1, prefix=''):
+    # chunks: iterable of (rows, 2) arrays of (x, y) samples
+    density = PhaseDensity(bins, x_range, y_range)
+    envelope = SeriesEnvelope(columns)
+    for block in chunks:
+        density.update(block[:, 0], block[:, 1])
+        envelope.update(block)
+    density.render(f'{prefix}phase_space.png', x, y)
+    envelope.render(f'{prefix}time_series.png', [x, y], every)
+    print(f'Saved {prefix}phase_space.png and {prefix}time_series.png ({envelope.count} samples)')
+    return density, envelope
+
+def run_and_plot_density(model_file, steps=10 ** 6, x='A', y='B', every=1, chunk=65536, bins=512, columns=2000,
+                         x_range=None, y_range=None, seed=None, profile='core', config=None, prefix=''):
+    # simulate and render in streaming chunks, any symbol pair, without keeping the trajectory
+    engine = make_engine(model_file, profile, config=config, seed=seed)
+    chunks = engine.iter_run(steps, record=[x, y], every=every, chunk=chunk)
+    return plot_chunks(chunks, x, y, bins, columns, x_range, y_range, every, prefix)
+
+def plot_trajectory_file(path, x='A', y='B', bins=512, columns=2000, x_range=None, y_range=None, prefix=''):
+    # the same plots from a sinks.TrajectorySink file, read chunk by chunk
+    def chunks():
+        for names, steps, states in iter_trajectory(path):
+            yield states[:, [names.index(x), names.index(y)]]
+    return plot_chunks(chunks(), x, y, bins, columns, x_range, y_range, 1, prefix)
+
+def run_and_plot_pca(model_file, steps=10 ** 5, components=2, symbols=None, every=1, chunk=65536, bins=512,
+                     columns=2000, max_points=20000, seed=None, profile='core', config=None, refit=False, prefix=''):
+    # Phase portrait of a whole network (or a symbol subset) on its top 2 or 3 principal components. The basis
+    # comes from projection.model_basis (cached per model and config); without a cached one the run is
+    # simulated twice from the same seed, once to fit and once to project. Three components add a 3D
+    # scatter of at most max_points evenly spaced samples.
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    pca = model_basis(model_file, components, steps, symbols, every, chunk, seed, profile, config=config, refit=refit)
+    labels = [f'PC{i + 1} ({share:.0%})' for i, share in enumerate(pca.explained())]
+    engine = make_engine(model_file, profile, config=config, seed=seed)
+    chunks = (pca.transform(block) for block in
+              engine.iter_run(steps, record=pca.names, every=every, chunk=chunk_rows(len(pca.names), chunk)))
+    if len(labels) < 3:
+        return plot_chunks(chunks, labels[0], labels[-1], bins, columns, every=every, prefix=prefix)
+    density = PhaseDensity(bins)
+    envelope = SeriesEnvelope(columns)
+    stride = max(1, steps // every // max_points)
+    sample = []
+    seen = 0
+    for block in chunks:
+        density.update(block[:, 0], block[:, 1])
+        envelope.update(block)
+        sample.append(block[(-seen) % stride::stride])
+        seen += len(block)
+    density.render(f'{prefix}phase_space.png', labels[0], labels[1])
+    envelope.render(f'{prefix}time_series.png', labels, every)
+    points = np.concatenate(sample)
+    points = points[(np.abs(points) < LIMIT).all(axis=1)]
+    fig = plt.figure()
+    ax = fig.add_subplot(projection='3d')
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2], s=1, c=np.arange(len(points)), cmap='viridis')
+    ax.set_xlabel(labels[0])
+    ax.set_ylabel(labels[1])
+    ax.set_zlabel(labels[2])
+    ax.set_title('Phase space, top 3 principal components')
+    fig.savefig(f'{prefix}phase_space_3d.png')
+    plt.close(fig)
+    print(f'Saved {prefix}phase_space.png, {prefix}phase_space_3d.png and {prefix}time_series.png ({seen} samples)')
+    return density, envelope, pca
+
 if __name__ == '__main__':
     run_and_plot('model_v04.json')
@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import numpy as np
+from backends import make_engine
+from model_cache import DEFAULT_DIR, default_cache, model_hash
+
+# Principal-component projection of (T x N) trajectories fed chunk by chunk, so the trajectory is never held:
+#   pca = IncrementalPCA(3); for block in chunks: pca.partial_fit(block)
+#   pca.transform(block) -> (rows, 3)
+# Up to SCATTER_LIMIT symbols the running mean and N x N scatter matrix are merged exactly per chunk and
+# eigendecomposed once; wider networks keep only the top k directions, updated by an SVD of the old basis
+# stacked on each chunk (Ross et al. incremental SVD, as in sklearn's IncrementalPCA).
+# Bases fitted by model_basis() are saved next to the compiled models ($SYMBOLIC_MODEL_CACHE) under a key
+# of the model content hash, profile, propagation, config, symbols and k, so later runs only project.
+# They count towards the cache's size limit and are evicted with the models, least recently used first.
+
+SCATTER_LIMIT = 2048
+LIMIT = 1e150  # rows of diverged runs beyond this would overflow the squared sums and are skipped
+
+
+def top_directions(stack, k):
+    # leading k singular values and right singular vectors; a wide stack goes through its small Gram matrix
+    if len(stack) >= stack.shape[1]:
+        _, s, vt = np.linalg.svd(stack, full_matrices=False)
+        return s[:k], vt[:k]
+    values, vectors = np.linalg.eigh(stack @ stack.T)
+    order = np.argsort(values)[::-1][:k]
+    s = np.sqrt(np.maximum(values[order], 0.0))
+    vt = vectors[:, order].T @ stack
+    return s, vt / np.where(s > 0, s, 1.0)[:, None]
+
+
+class IncrementalPCA:
+    def __init__(self, k=2, method='auto'):
+        self.k = k
+        self.method = method
+        self.n = 0
+        self.mean = None
+        self.scatter = None
+        self.singular = None
+        self.sum_squares = 0.0   # svd method: total squared deviation, for the explained fraction
+        self.components = None   # (k, N) unit rows, largest variance first
+        self.variance = None     # variance along each component
+        self.total_variance = None
+        self.names = None
+
+    def partial_fit(self, block):
+        x = np.asarray(block, dtype=float)
+        with np.errstate(invalid='ignore'):
+            x = x[(np.abs(x) < LIMIT).all(axis=1)]
+        if not len(x):
+            return self
+        if self.method == 'auto':
+            self.method = 'scatter' if x.shape[1] <= SCATTER_LIMIT else 'svd'
+        b = len(x)
+        mean_b = x.mean(axis=0)
+        dev = x - mean_b
+        if self.method == 'scatter':
+            scatter_b = dev.T @ dev
+            if self.n == 0:
+                self.mean, self.scatter = mean_b, scatter_b
+            else:
+                # Chan et al. pairwise merge of mean and scatter
+                delta = mean_b - self.mean
+                total = self.n + b
+                self.scatter += scatter_b + np.outer(delta, delta) * (self.n * b / total)
+                self.mean = self.mean + delta * (b / total)
+            self.components = None
+        else:
+            self.sum_squares += (dev * dev).sum()
+            if self.n == 0:
+                self.mean = mean_b
+                stack = dev
+            else:
+                total = self.n + b
+                shift = np.sqrt(self.n * b / total) * (self.mean - mean_b)
+                stack = np.vstack([self.singular[:, None] * self.components, dev, shift[None]])
+                self.sum_squares += (shift * shift).sum()
+                self.mean = self.mean + (mean_b - self.mean) * (b / total)
+            self.singular, self.components = top_directions(stack, self.k)
+        self.n += b
+        return self
+
+    def basis(self):
+        # (components, variance); fixes each component's sign so its largest entry is positive
+        if self.components is None and self.scatter is not None:
+            values, vectors = np.linalg.eigh(self.scatter / max(self.n - 1, 1))
+            order = np.argsort(values)[::-1][:self.k]
+            self.components = vectors[:, order].T
+            self.variance = np.maximum(values[order], 0.0)
+            self.total_variance = max(values.sum(), 0.0)
+        elif self.method == 'svd' and self.components is not None:
+            self.variance = self.singular ** 2 / max(self.n - 1, 1)
+            self.total_variance = self.sum_squares / max(self.n - 1, 1)
+        if self.components is None:
+            raise ValueError('no samples fitted (no finite rows below LIMIT)')
+        rows = np.arange(len(self.components))
+        signs = np.sign(self.components[rows, np.abs(self.components).argmax(axis=1)])
+        self.components = self.components * np.where(signs == 0, 1.0, signs)[:, None]
+        return self.components, self.variance
+
+    def explained(self):
+        # fraction of the total variance along each component
+        self.basis()
+        total = self.total_variance
+        return self.variance / total if total > 0 else np.zeros(len(self.variance))
+
+    def transform(self, block):
+        components, _ = self.basis()
+        return (np.asarray(block, dtype=float) - self.mean) @ components.T
+
+    def save(self, path):
+        # written under a temporary name and renamed, like model_cache entries
+        self.basis()
+        tmp = f'{path}.tmp{os.getpid()}.npz'
+        np.savez(tmp, mean=self.mean, components=self.components, variance=self.variance,
+                 total=np.array(self.total_variance), n=np.array(self.n),
+                 names=np.array(self.names if self.names is not None else [], dtype=str))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            pca = cls(len(data['components']), method='loaded')
+            pca.mean = data['mean']
+            pca.components = data['components']
+            pca.variance = data['variance']
+            pca.total_variance = float(data['total'])
+            pca.n = int(data['n'])
+            pca.names = data['names'].tolist() or None
+        return pca
+
+
+def basis_path(model_file, k, symbols=None, profile='core', propagation='sequential', config=None):
+    text = json.dumps([model_hash(model_file), k, symbols, profile, propagation, config], sort_keys=True)
+    return os.path.join(DEFAULT_DIR, f'pca-{hashlib.sha256(text.encode()).hexdigest()}.npz')
+
+
+def chunk_rows(n_symbols, chunk):
+    # rows per chunk, at most about 16M values in flight however wide the network
+    return max(1, min(chunk, (1 << 24) // max(n_symbols, 1)))
+
+
+def model_basis(model_file, k=2, steps=10 ** 5, symbols=None, every=1, chunk=65536, seed=None, profile='core',
+                propagation='sequential', config=None, refit=False, cache=True):
+    # PCA basis of a model's trajectory over `symbols` (default all), from the cache or fitted on a
+    # streamed run of `steps` ticks and then cached. Returns an IncrementalPCA ready to transform().
+    path = basis_path(model_file, k, symbols, profile, propagation, config)
+    if cache and not refit and os.path.exists(path):
+        try:
+            pca = IncrementalPCA.load(path)
+            os.utime(path)
+            return pca
+        except (OSError, ValueError, KeyError):
+            pass
+    engine = make_engine(model_file, profile, propagation=propagation, config=config, seed=seed)
+    names = list(engine.symbols) if symbols is None else list(symbols)
+    pca = IncrementalPCA(min(k, len(names)))
+    pca.names = names
+    for block in engine.iter_run(steps, record=names, every=every, chunk=chunk_rows(len(names), chunk)):
+        pca.partial_fit(block)
+    if cache:
+        try:
+            os.makedirs(DEFAULT_DIR, exist_ok=True)
+            pca.save(path)
+            default_cache.evict()
+        except OSError:
+            # read-only cache directory: the basis is still returned
+            pass
+    return pca
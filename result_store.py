@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import contextlib
+import numpy as np
+from model_cache import model_hash
+from symbolic_core import ENGINE_VERSION
+
+# Local store of simulation results (SQLite, one file). Every result is keyed by the hash of
+#   kind, model content hash, config, seed, steps, ENGINE_VERSION and the analysis options,
+# so a scan or analysis asks the store first and only computes the points it has not seen.
+# Numeric config values are also kept in an indexed (name, value) table for queries across past runs:
+#   ResultStore().query('scan', 'model_v04.json', where={'decay_rate': (0.85, 0.95), 'bind_coeff': 0.1})
+# Runs seeded from fresh OS entropy (seed=None) are stored for querying but can never be looked up again.
+
+DEFAULT_PATH = os.environ.get('SYMBOLIC_RESULTS', 'symbolic_results.sqlite')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    model_hash TEXT NOT NULL,
+    config TEXT NOT NULL,
+    options TEXT NOT NULL,
+    seed TEXT,
+    steps INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model_hash, kind);
+CREATE TABLE IF NOT EXISTS params (
+    run INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS params_value ON params (name, value);
+'''
+
+
+def plain(value):
+    # numpy scalars/arrays to JSON types
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def dumps(value):
+    return json.dumps(value, sort_keys=True, default=plain)
+
+
+def seed_text(seed):
+    # stable text for an int or SeedSequence seed; a SeedSequence without given entropy draws its own
+    if seed is None:
+        return None
+    if isinstance(seed, np.random.SeedSequence):
+        return dumps([str(seed.entropy), list(seed.spawn_key), seed.pool_size])
+    return str(int(seed))
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60)
+        # several scans may share one store
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA foreign_keys=ON')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def key(self, kind, digest, config, seed, steps, options):
+        text = dumps([kind, digest, config, seed_text(seed), steps, ENGINE_VERSION, options])
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def lookup(self, kind, model_file, configs, seeds, steps, options=None):
+        # {position: stored result} for the (config, seed) pairs already computed
+        digest = model_hash(model_file)
+        keys = {}
+        for i, (config, seed) in enumerate(zip(configs, seeds)):
+            if seed is not None:
+                keys[self.key(kind, digest, config, seed, steps, options or {})] = i
+        found = {}
+        names = list(keys)
+        # SQLite caps the number of bound parameters per statement
+        for start in range(0, len(names), 500):
+            part = names[start:start + 500]
+            rows = self.db.execute(f'SELECT key, result FROM runs WHERE key IN ({",".join("?" * len(part))})', part)
+            for key, result in rows:
+                found[keys[key]] = json.loads(result)
+        return found
+
+    def save(self, kind, model_file, configs, seeds, steps, results, options=None):
+        digest = model_hash(model_file)
+        options = options or {}
+        now = time.time()
+        with self.db:
+            for config, seed, result in zip(configs, seeds, results):
+                key = self.key(kind, digest, config, seed, steps, options)
+                cur = self.db.execute(
+                    'INSERT OR IGNORE INTO runs (key, kind, model, model_hash, config, options, seed, steps, version, '
+                    'created, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, kind, os.path.abspath(model_file), digest, dumps(config), dumps(options), seed_text(seed),
+                     steps, ENGINE_VERSION, now, json.dumps(result, default=plain)))
+                if cur.rowcount:
+                    self.db.executemany('INSERT INTO params (run, name, value) VALUES (?, ?, ?)',
+                                        [(cur.lastrowid, name, float(value)) for name, value in config.items()
+                                         if isinstance(value, (int, float, np.number)) and not isinstance(value, bool)])
+
+    def query(self, kind=None, model_file=None, where=None, limit=None, current=True):
+        # where: {config key: value or (low, high)}; current=False also returns results of older engine versions.
+        # Returns dicts with model, config, options, seed, steps, created and result, oldest first.
+        joins, conds, join_args, args = [], [], [], []
+        for n, (name, cond) in enumerate((where or {}).items()):
+            joins.append(f'JOIN params p{n} ON p{n}.run = runs.id AND p{n}.name = ?')
+            join_args.append(name)
+            if isinstance(cond, (tuple, list)):
+                conds.append(f'p{n}.value BETWEEN ? AND ?')
+                args += [float(cond[0]), float(cond[1])]
+            else:
+                conds.append(f'p{n}.value = ?')
+                args.append(float(cond))
+        if kind is not None:
+            conds.append('runs.kind = ?')
+            args.append(kind)
+        if model_file is not None:
+            conds.append('runs.model_hash = ?')
+            args.append(model_hash(model_file))
+        if current:
+            conds.append('runs.version = ?')
+            args.append(ENGINE_VERSION)
+        sql = ('SELECT runs.model, runs.config, runs.options, runs.seed, runs.steps, runs.created, runs.result '
+               f'FROM runs {" ".join(joins)}')
+        if conds:
+            sql += ' WHERE ' + ' AND '.join(conds)
+        sql += ' ORDER BY runs.id'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return [{'model': model, 'config': json.loads(config), 'options': json.loads(options),
+                 'seed': seed, 'steps': steps, 'created': created, 'result': json.loads(result)}
+                for model, config, options, seed, steps, created, result in self.db.execute(sql, join_args + args)]
+
+    def count(self, kind=None):
+        if kind is None:
+            return self.db.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+        return self.db.execute('SELECT COUNT(*) FROM runs WHERE kind = ?', (kind,)).fetchone()[0]
+
+
+def open_store(store):
+    # None, a path or a ResultStore
+    if store is None or isinstance(store, ResultStore):
+        return store
+    return ResultStore(store)
+
+
+@contextlib.contextmanager
+def using_store(store):
+    # open_store for a with block: a store opened here from a path is closed at the end, a ResultStore
+    # passed in stays open for its owner
+    opened = open_store(store)
+    try:
+        yield opened
+    finally:
+        if opened is not store:
+            opened.close()
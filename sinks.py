@@ -0,0 +1,260 @@
+import os
+import gzip
+import json
+import queue
+import threading
+import numpy as np
+from event_log import STATES, format_record
+
+# Streaming destinations for EventLog records: engine.log.attach(sink) sends everything logged from then on
+# to the sink while the run goes on, so nothing has to be kept in memory for export_log.
+# Records are collected up to batch_bytes and then handed to a writer thread through a queue holding at most
+# queue_bytes (the run blocks when the writer falls behind), so a sink holds about batch_bytes + queue_bytes
+# plus what the writer is working on. Files rotate when they pass max_bytes, checked after every write: the
+# full file is renamed to path.1, path.2, ... in order and writing continues in a fresh path.
+
+_CLOSE = object()
+
+
+class Sink:
+    def __init__(self, path, max_bytes=None, batch_bytes=1 << 22, queue_bytes=1 << 24, background=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_bytes = batch_bytes
+        self.queue_bytes = queue_bytes
+        self.part = 0
+        self.pending = []
+        self.pending_bytes = 0
+        self.queued_bytes = 0
+        self.space = threading.Condition()
+        self.error = None
+        # a new sink starts a new series: parts left over from an earlier run at this path would mix in
+        for part in parts(path)[:-1]:
+            os.remove(part)
+        self.file = self.open_file()
+        self.queue = queue.Queue() if background else None
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.writer, daemon=True)
+            self.thread.start()
+
+    # --- called from the engine thread ---
+
+    def put(self, block, text, rows, names, formats):
+        self.pending.append((block, text, rows, names, formats))
+        # text is left out: only MESSAGE records carry any
+        self.pending_bytes += block.nbytes + sum(row.nbytes for row in rows.values())
+        if self.pending_bytes >= self.batch_bytes:
+            self.flush()
+
+    def flush(self):
+        if self.error is not None:
+            raise self.error
+        items, size = self.pending, self.pending_bytes
+        self.pending, self.pending_bytes = [], 0
+        if not items:
+            return
+        if self.queue is None:
+            self.write_items(items)
+            return
+        with self.space:
+            # a batch larger than the whole budget still goes through once the queue is empty
+            while self.queued_bytes and self.queued_bytes + size > self.queue_bytes:
+                self.space.wait()
+            self.queued_bytes += size
+        self.queue.put((items, size))
+
+    def close(self):
+        self.flush()
+        if self.queue is not None:
+            self.queue.put(_CLOSE)
+            self.thread.join()
+        if self.error is None:
+            self.finish()
+        self.close_file()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- writer side ---
+
+    def writer(self):
+        while True:
+            entry = self.queue.get()
+            if entry is _CLOSE:
+                return
+            items, size = entry
+            if self.error is None:
+                try:
+                    self.write_items(items)
+                except Exception as e:
+                    # reported to the engine thread on its next flush/close
+                    self.error = e
+            with self.space:
+                self.queued_bytes -= size
+                self.space.notify()
+
+    def write_items(self, items):
+        for block, text, rows, names, formats in items:
+            self.write(block, text, rows, names, formats)
+
+    def check_size(self):
+        # called by the sinks after each piece they write
+        if self.max_bytes is not None and self.size() >= self.max_bytes:
+            self.rotate()
+
+    def size(self):
+        return self.file.tell()
+
+    def rotate(self):
+        self.finish()
+        self.close_file()
+        self.part += 1
+        os.replace(self.path, f'{self.path}.{self.part}')
+        self.file = self.open_file()
+
+    def finish(self):
+        # write out anything the sink still holds (before rotating or closing)
+        pass
+
+    def close_file(self):
+        self.file.close()
+
+    def open_file(self):
+        raise NotImplementedError
+
+    def write(self, block, text, rows, names, formats):
+        raise NotImplementedError
+
+
+class TextSink(Sink):
+    # the log lines export_log would write, streamed `lines` at a time
+    lines = 64
+
+    def open_file(self):
+        return open(self.path, 'w', encoding='utf-8', buffering=1 << 16)
+
+    def write(self, block, text, rows, names, formats):
+        recs = block.tolist()
+        for start in range(0, len(recs), self.lines):
+            lines = []
+            for i in range(start, min(start + self.lines, len(recs))):
+                rec = recs[i]
+                row = rows.get(int(rec[4])) if rec[1] == STATES else None
+                lines.append(format_record(rec, text[i] if text is not None else None, names, formats, row) + '\n')
+            self.file.write(''.join(lines))
+            self.check_size()
+
+
+class GzipSink(TextSink):
+    def open_file(self):
+        self.raw = open(self.path, 'wb')
+        return gzip.open(self.raw, 'wt', encoding='utf-8')
+
+    def size(self):
+        # compressed bytes on disk
+        return self.raw.tell()
+
+    def close_file(self):
+        self.file.close()
+        self.raw.close()
+
+
+class TrajectorySink(Sink):
+    # Binary state trajectory: one JSON header line (names, dtype), then chunks of
+    #   int64 rows | int64 steps[rows] | dtype states[rows, n_symbols]
+    # States are collected to `chunk` rows or chunk_bytes (at most max_bytes) before a write. Events are not
+    # stored. read_trajectory reads it back.
+    def __init__(self, path, max_bytes=None, chunk=4096, dtype=np.float64, chunk_bytes=1 << 22, **kw):
+        self.chunk = chunk
+        self.chunk_bytes = chunk_bytes if max_bytes is None else min(chunk_bytes, max_bytes)
+        self.dtype = np.dtype(dtype)
+        self.names = None
+        self.steps = []
+        self.rows = []
+        super().__init__(path, max_bytes, **kw)
+
+    def open_file(self):
+        self.header_written = False
+        return open(self.path, 'wb')
+
+    def write(self, block, text, rows, names, formats):
+        if self.names is not None and self.names is not names:
+            # another model: its states go to a new part with its own header
+            self.write_chunk()
+            if self.header_written:
+                self.rotate()
+        self.names = names
+        limit = max(1, min(self.chunk, self.chunk_bytes // max(1, len(names) * self.dtype.itemsize)))
+        for rec in block[block['kind'] == STATES].tolist():
+            row = rows.get(int(rec[4]))
+            if row is not None:
+                self.steps.append(rec[0])
+                self.rows.append(row)
+                if len(self.rows) >= limit:
+                    self.write_chunk()
+
+    def write_chunk(self):
+        if not self.rows:
+            return
+        if not self.header_written:
+            header = {'names': [str(n) for n in self.names], 'dtype': self.dtype.str}
+            self.file.write((json.dumps(header) + '\n').encode())
+            self.header_written = True
+        states = np.array(self.rows, dtype=self.dtype)
+        self.file.write(np.int64(len(states)).tobytes())
+        self.file.write(np.array(self.steps, dtype=np.int64).tobytes())
+        self.file.write(states.tobytes())
+        self.steps = []
+        self.rows = []
+        self.check_size()
+
+    def finish(self):
+        self.write_chunk()
+
+
+def parts(path):
+    # rotated parts first (oldest first), then the live file
+    n = 1
+    out = []
+    while os.path.exists(f'{path}.{n}'):
+        out.append(f'{path}.{n}')
+        n += 1
+    return out + [path]
+
+
+def iter_trajectory(path):
+    # yields (names, steps, states) per stored chunk over all rotated parts, never holding more than one chunk
+    for part in parts(path):
+        with open(part, 'rb') as f:
+            line = f.readline()
+            if not line:
+                continue
+            header = json.loads(line)
+            names = header['names']
+            dtype = np.dtype(header['dtype'])
+            while True:
+                n = f.read(8)
+                if len(n) < 8:
+                    break
+                n = int(np.frombuffer(n, dtype=np.int64)[0])
+                steps = np.frombuffer(f.read(8 * n), dtype=np.int64)
+                states = np.frombuffer(f.read(dtype.itemsize * n * len(names)), dtype=dtype).reshape(n, len(names))
+                yield names, steps, states
+
+
+def read_trajectory(path):
+    # returns (names, steps, states) over all rotated parts of a TrajectorySink file
+    names = None
+    steps, states = [], []
+    for names, s, x in iter_trajectory(path):
+        steps.append(s)
+        states.append(x)
+    if not states:
+        return names, np.zeros(0, dtype=np.int64), np.zeros((0, len(names or [])))
+    return names, np.concatenate(steps), np.concatenate(states)
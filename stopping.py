@@ -0,0 +1,94 @@
+from collections import deque
+import numpy as np
+
+FIXED_POINT = 'fixed_point'
+PERIODIC = 'periodic'
+DIVERGED = 'diverged'
+
+
+class StopMonitor:
+    # Watches a run and decides when nothing new can happen:
+    #   fixed point - largest state change below tol for `patience` consecutive checks
+    #   periodic    - state recurs (on a period_tol grid) within max_period ticks
+    #   diverged    - NaN/inf or norm above max_norm
+    # Works on a single state vector or on the rows of an ensemble state matrix; a run stops once every
+    # row has a regime. Results: regimes/steps/periods per row (regime/step/period for a single engine).
+    def __init__(self, tol=1e-10, patience=5, period_tol=1e-6, max_period=100, max_norm=1e6, every=1):
+        self.tol = tol
+        self.patience = patience
+        self.period_tol = period_tol
+        self.max_period = max_period
+        self.max_norm = max_norm
+        self.every = every
+        self.reset(1)
+
+    def reset(self, n_rows=1):
+        self.regimes = np.full(n_rows, None, dtype=object)
+        self.steps = np.full(n_rows, -1)
+        self.periods = np.zeros(n_rows, dtype=int)
+        self.last = None
+        self.calm = np.zeros(n_rows, dtype=int)
+        self.seen = [dict() for _ in range(n_rows)]
+        self.order = [deque() for _ in range(n_rows)]
+
+    @property
+    def regime(self):
+        return self.regimes[0]
+
+    @property
+    def step(self):
+        return int(self.steps[0])
+
+    @property
+    def period(self):
+        return int(self.periods[0])
+
+    @property
+    def done(self):
+        return all(r is not None for r in self.regimes)
+
+    def decide(self, rows, regime, step, period=0):
+        rows = [r for r in np.atleast_1d(rows).tolist() if self.regimes[r] is None]
+        self.regimes[rows] = regime
+        self.steps[rows] = step
+        self.periods[rows] = period
+
+    def update(self, step, x):
+        # returns True when every row has settled
+        if step % self.every:
+            return False
+        x = np.atleast_2d(x)
+        if len(x) != len(self.regimes):
+            self.reset(len(x))
+        open_rows = np.array([r is None for r in self.regimes])
+
+        bad = ~np.isfinite(x).all(axis=1) | (np.sqrt((x * x).sum(axis=1)) > self.max_norm)
+        self.decide(np.flatnonzero(bad & open_rows), DIVERGED, step)
+        open_rows &= ~bad
+
+        if self.last is not None:
+            change = np.abs(x - self.last).max(axis=1) if x.shape[1] else np.zeros(len(x))
+            self.calm = np.where(change < self.tol, self.calm + 1, 0)
+            self.decide(np.flatnonzero((self.calm >= self.patience) & open_rows), FIXED_POINT, step, 1)
+        self.last = x.copy()
+
+        for r in np.flatnonzero(open_rows).tolist():
+            if self.regimes[r] is not None:
+                continue
+            key = np.round(x[r] / self.period_tol).astype(np.int64).tobytes()
+            seen, order = self.seen[r], self.order[r]
+            if key in seen:
+                lag = step - seen[key]
+                if lag > self.every:
+                    self.decide(r, PERIODIC, step, lag)
+                    continue
+                # same cell as the previous check: a slow drift, not a recurrence (fixed points are
+                # only declared by tol and patience above); the cell is re-dated so lingering never
+                # turns into a period
+            seen[key] = step
+            order.append((step, key))
+            while order and step - order[0][0] > self.max_period:
+                old_step, old_key = order.popleft()
+                if seen.get(old_key) == old_step:
+                    del seen[old_key]
+        return self.done
@@ -1,20 +1,96 @@
-
 import json
 import random
 import copy
+import numpy as np
+from noise import NoiseStream, NoiseLayout, sign
+from event_log import (EventLog, LOG_OFF, LOG_STATES, LOG_EVENTS, TICK, BIND, CYCLE, DECAY,
+                       INVERT, THRESHOLD_INVERT, RANDOM_INVERT, NOISE_SEED, BACKGROUND_NOISE)
+import modifier_rules
+
+# bump when a change alters simulated trajectories: stored results (result_store.py) of older versions stop matching
+ENGINE_VERSION = 1
+
+DEFAULT_CONFIG = {
+    'decay_rate':0.9,
+    'bind_coeff':0.1,
+    'cycle_coeff':0.5,
+    'random_invert_p':0.3,
+    'noise_seed_p':0.2,
+    'background_noise_amp':0.05
+}
+
+# defaults of the dynamics formerly implemented by symbolic_engine.py
+ENGINE_CONFIG = {
+    'decay_rate':0.95,
+    'bind_coeff':0.1,
+    'cycle_coeff':0.2,
+    'random_invert_p':0.3,
+    'noise_seed_p':0.2,
+    'background_noise_amp':0.05,
+    'noise_seed_tol':1e-6,
+    'noise_base':0.01
+}
+
+# text templates for EventLog records, matching the historic log lines
+CORE_FORMATS = {
+    TICK: 'Tick complete.',
+    BIND: 'bind transfer {value:.4f} from {src} to {dst}',
+    CYCLE: 'cycle feedback {value:.4f} from prev {src} to {dst} ({old:.4f}->{new:.4f})',
+    DECAY: 'decay/noise {dst} {old:.4f}->{new:.4f}',
+    INVERT: 'invert({dst})',
+    RANDOM_INVERT: 'random_invert({dst})',
+    NOISE_SEED: 'noise_seed applied to {dst}, new state {new}',
+    BACKGROUND_NOISE: 'background_noise on {dst} -> {value:.4f}',
+}
+
+ENGINE_FORMATS = {
+    TICK: 'Tick complete.',
+    BIND: 'bind transfer {value:.4f} from {src} to {dst} ({old:.4f}->{new:.4f})',
+    CYCLE: 'cycle feedback {value:.4f} from prev {src} to {dst} ({old:.4f}->{new:.4f})',
+    DECAY: 'decay/noise {dst} {old:.4f}->{new:.4f}',
+    INVERT: 'invert({dst}) -> {new:.3f}',
+    THRESHOLD_INVERT: 'threshold_invert({dst}) -> {new:.3f}',
+    RANDOM_INVERT: 'random_invert({dst}) -> {new:.3f}',
+    NOISE_SEED: 'noise_seed applied to {dst}, new state {new:.3f}',
+    BACKGROUND_NOISE: 'background_noise on {dst} -> {new:.3f}',
+}
+
+# Dynamics profiles shared by every backend:
+#   cycle         'additive': dst += prev_src * cycle_coeff; 'pull': dst += (prev_src - dst) * cycle_coeff
+#   binds_first   apply all bind links before all cycle links instead of in file order
+#   prev_at_start prev is taken at the start of the tick instead of after decay
+#   base_noise    add uniform(-noise_base, noise_base) to every symbol after decay
+#   signs         random.choice order of Symbol.invert without a uniform (kept for replaying old runs)
+PROFILES = {
+    'core': {'config': DEFAULT_CONFIG, 'formats': CORE_FORMATS, 'cycle': 'additive', 'binds_first': False,
+             'prev_at_start': False, 'base_noise': False, 'signs': (-1.0, 1.0),
+             'rules': ('invert', 'random_invert', 'noise_seed', 'background_noise')},
+    'engine': {'config': ENGINE_CONFIG, 'formats': ENGINE_FORMATS, 'cycle': 'pull', 'binds_first': True,
+               'prev_at_start': True, 'base_noise': True, 'signs': (1.0, -1.0),
+               'rules': ('invert', 'threshold_invert', 'random_invert', 'noise_seed', 'background_noise')},
+}
+
+# link propagation: 'sequential' applies links one after another in order (historic behaviour),
+# 'simultaneous' lets every link of a phase read the state from before that phase (matrix semantics)
+PROPAGATION_MODES = ('sequential', 'simultaneous')
 
 class Symbol:
+    __slots__ = ('name', 'state')
+
     def __init__(self, name, state):
         self.name = name
         self.state = float(state)
 
-    def invert(self):
+    def invert(self, u=None, choices=(-1.0, 1.0)):
+        # u: uniform for the sign of a zero state; None draws from the random module
         if self.state == 0.0:
-            self.state = random.choice([-1.0, 1.0])
+            self.state = random.choice(choices) if u is None else sign(u)
         else:
             self.state = -self.state
 
 class Link:
+    __slots__ = ('from_symbol', 'to_symbol', 'weight', 'type')
+
     def __init__(self, from_symbol, to_symbol, weight, ltype):
         self.from_symbol = from_symbol
         self.to_symbol = to_symbol
@@ -22,113 +98,384 @@ class Link:
         self.type = ltype
 
 class Modifier:
+    __slots__ = ('target', 'rule')
+
     def __init__(self, target, rule):
         self.target = target
         self.rule = rule
 
+
+class Snapshot:
+    # engine state at one step: state and prev vectors (in symbol order), step count and RNG state
+    def __init__(self, names, state, prev, step_count, rng):
+        # names may stay a numpy array (array backends): no per-symbol str objects for huge models
+        self.names = names if isinstance(names, np.ndarray) else list(names)
+        self.state = state
+        self.prev = prev
+        self.step_count = step_count
+        self.rng = rng
+
+    def save(self, path):
+        rng = dict(self.rng)
+        buf = rng.pop('buf', np.zeros((0, 0)))
+        np.savez_compressed(path, names=np.array(self.names), state=self.state, prev=self.prev,
+                            step_count=self.step_count, rng=json.dumps(rng), rng_buf=buf)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            rng = json.loads(str(data['rng']))
+            if rng['kind'] == 'numpy':
+                rng['buf'] = data['rng_buf']
+            return cls(data['names'].tolist(), data['state'], data['prev'], int(data['step_count']), rng)
+
+
 class SymbolicEngine:
-    def __init__(self, config=None):
+    # Reference (pure Python) backend of the engine. symbolic_vector.VectorEngine and
+    # symbolic_sparse.SparseEngine implement the same profiles and propagation modes on arrays;
+    # backends.make_engine picks one by network size.
+    def __init__(self, config=None, log_level=LOG_EVENTS, seed=None, profile='core', propagation='sequential'):
         # config holds coefficients: decay_rate, bind_coeff, cycle_coeff, random_invert_p, noise_seed_p, background_noise_amp
+        # (missing keys take the profile defaults)
+        # log_level: LOG_OFF (messages only), LOG_STATES (plus per-tick states) or LOG_EVENTS (everything)
+        # seed: of the engine's NoiseStream, which draws each tick's random numbers in one batch
+        # (None seeds it from OS entropy; the shared random module is never touched)
+        if propagation not in PROPAGATION_MODES:
+            raise ValueError(f'unknown propagation mode {propagation}')
+        self.profile_name = profile
+        self.profile = PROFILES[profile]
+        self.propagation = propagation
         self.symbols = {}
+        self.index = {}
         self.links = []
         self.modifiers = []
         self.step_count = 0
-        self.log = []
-        self.config = config or {
-            'decay_rate':0.9,
-            'bind_coeff':0.1,
-            'cycle_coeff':0.5,
-            'random_invert_p':0.3,
-            'noise_seed_p':0.2,
-            'background_noise_amp':0.05
-        }
+        self.log = EventLog(log_level, self.profile['formats'])
+        self.config = dict(self.profile['config'], **config) if config else dict(self.profile['config'])
         self.prev_B = {}
+        # reused between ticks by simultaneous propagation
+        self.frozen = {}
+        self.pulled = {}
+        self.inputs = []
+        self.noise = NoiseStream(seed)
 
     def load_model(self, filepath):
+        # compiled once per file by model_cache (imported here, it builds on symbolic_vector)
+        from model_cache import load_cached
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            model = load_cached(filepath)
         except Exception as e:
             self.log.append(f'[ERROR] loading model: {e}')
             return
-        self.symbols = {s['name']: Symbol(s['name'], s['state']) for s in data.get('symbols', []) if 'name' in s}
+        self.load_compiled(model)
+        self.log.append(f'[INFO] Model {filepath} loaded: symbols={list(self.symbols.keys())}, modifiers={[m.rule for m in self.modifiers]}, links={[ (l.from_symbol,l.to_symbol,l.type) for l in self.links ]}')
+
+    def load_data(self, data):
+        # data follows the JSON model schema: symbols, links, modifiers
+        self.symbols = {s['name']: Symbol(s['name'], s['state']) for s in data.get('symbols', []) if 'name' in s and 'state' in s}
+        self.index = {name: i for i, name in enumerate(self.symbols)}
+        self.log.set_names(self.symbols)
         self.links = []
         for l in data.get('links', []):
             if all(k in l for k in ('from','to','weight','type')):
                 self.links.append(Link(l['from'], l['to'], l['weight'], l['type']))
+        if self.profile['binds_first']:
+            self.tick_links = [l for l in self.links if l.type == 'bind'] + [l for l in self.links if l.type == 'cycle']
+        else:
+            self.tick_links = self.links
         self.modifiers = []
         for m in data.get('modifiers', []):
             if 'target' in m and 'rule' in m:
                 self.modifiers.append(Modifier(m['target'], m['rule']))
+        for m in self.modifiers:
+            if m.target in self.symbols and not modifier_rules.available(m.rule, self.profile['rules']):
+                self.log.append(f'[INFO] unknown modifier {m.rule} on {m.target} ignored')
+        self.configure_noise()
         # store previous B for cycle feedback
         self.prev_B = {name: sym.state for name, sym in self.symbols.items()}
-        self.log.append(f'[INFO] Model {filepath} loaded: symbols={list(self.symbols.keys())}, modifiers={[m.rule for m in self.modifiers]}, links={[ (l.from_symbol,l.to_symbol,l.type) for l in self.links ]}')
+        self.frozen = {}
+        self.pulled = {}
 
-    def apply_modifiers(self):
-        for m in self.modifiers:
+    def load_compiled(self, model):
+        # symbolic_vector.CompiledModel, as used by the array backends
+        self.load_data(model.to_data())
+
+    def configure_noise(self):
+        rules = [m.rule if m.target in self.symbols else None for m in self.modifiers]
+        n_base = len(self.symbols) if self.profile['base_noise'] else 0
+        self.noise.configure(NoiseLayout(rules, n_base))
+
+    def apply_modifiers(self, u, rec=None):
+        # u: the tick's row of uniforms from the NoiseStream
+        # rec: the tick's list of event records (see tick); without one they go to the log directly
+        events = self.log.level >= LOG_EVENTS
+        own = events and rec is None
+        step = self.step_count
+        if own:
+            rec = []
+        cols = self.noise.layout.cols
+        choices = self.profile['signs']
+        allowed = self.profile['rules']
+        for k, m in enumerate(self.modifiers):
             if m.target in self.symbols:
                 sym = self.symbols[m.target]
-                if m.rule == 'invert':
-                    sym.invert()
-                    self.log.append(f'[{self.step_count}] invert({m.target})')
-                elif m.rule == 'random_invert':
-                    if random.random() < self.config['random_invert_p']:
-                        sym.invert()
-                        self.log.append(f'[{self.step_count}] random_invert({m.target})')
-                elif m.rule == 'noise_seed':
-                    if sym.state == 0.0 and random.random() < self.config['noise_seed_p']:
-                        sym.state = random.choice([-1.0,1.0])
-                        self.log.append(f'[{self.step_count}] noise_seed applied to {m.target}, new state {sym.state}')
-                elif m.rule == 'background_noise':
+                rule = m.rule if m.rule in allowed else None
+                if rule == 'invert':
+                    sym.invert(u[cols[k][0]], choices)
+                    if events:
+                        rec.append((step, INVERT, -1, self.index[m.target], 0.0, 0.0, sym.state, None))
+                elif rule == 'threshold_invert':
+                    if sym.state > 0:
+                        sym.invert(None, choices)
+                        if events:
+                            rec.append((step, THRESHOLD_INVERT, -1, self.index[m.target], 0.0, 0.0, sym.state, None))
+                elif rule == 'random_invert':
+                    if u[cols[k][0]] < self.config['random_invert_p']:
+                        sym.invert(u[cols[k][1]], choices)
+                        if events:
+                            rec.append((step, RANDOM_INVERT, -1, self.index[m.target], 0.0, 0.0, sym.state, None))
+                elif rule == 'noise_seed':
+                    zero = sym.state == 0.0 or abs(sym.state) < self.config.get('noise_seed_tol', 0.0)
+                    if zero and u[cols[k][0]] < self.config['noise_seed_p']:
+                        sym.state = sign(u[cols[k][1]])
+                        if events:
+                            rec.append((step, NOISE_SEED, -1, self.index[m.target], 0.0, 0.0, sym.state, None))
+                elif rule == 'background_noise':
                     amp = self.config['background_noise_amp']
-                    delta = random.uniform(-amp, amp)
+                    delta = -amp + (amp + amp) * u[cols[k][0]]
                     old = sym.state
                     sym.state += delta
-                    self.log.append(f'[{self.step_count}] background_noise on {m.target} -> {delta:.4f}')
-                else:
-                    self.log.append(f'[{self.step_count}] unknown modifier {m.rule} on {m.target}')
+                    if events:
+                        rec.append((step, BACKGROUND_NOISE, -1, self.index[m.target], delta, old, sym.state, None))
+                elif m.rule in modifier_rules.RULES and m.rule not in modifier_rules.BUILTIN_RULES:
+                    # custom vectorized rule registered with modifier_rules, run on a single target
+                    r = modifier_rules.RULES[m.rule]
+                    draws = [u[c] for c in cols[k]]
+                    old = sym.state
+                    new, fired, value = r.kernel(np.array([old]), np.array(draws).reshape(r.draws, 1), self.config)
+                    sym.state = float(new[0])
+                    if events and r.kind is not None and fired[0]:
+                        rec.append((step, r.kind, -1, self.index[m.target],
+                                    0.0 if value is None else float(value[0]), old, sym.state, None))
+        if own and rec:
+            self.log.extend(rec)
 
     def tick(self):
         self.step_count += 1
-        self.apply_modifiers()
+        step = self.step_count
+        profile = self.profile
+        events = self.log.level >= LOG_EVENTS
+        # event records of the tick, handed to the log in one batch by end_tick
+        rec = [] if events else None
+        index = self.index
+        symbols = self.symbols
+        prev_B = self.prev_B
+        if profile['prev_at_start']:
+            # snapshot previous states for delayed cycle feedback (updated in place, no per-tick dict)
+            prev_B.update((name, sym.state) for name, sym in symbols.items())
+
+        u = self.noise.next().tolist()
+        self.apply_modifiers(u, rec)
 
-        # bind transfer
-        for link in self.links:
-            if link.from_symbol in self.symbols and link.to_symbol in self.symbols:
-                src = self.symbols[link.from_symbol]
-                dst = self.symbols[link.to_symbol]
+        simultaneous = self.propagation == 'simultaneous'
+        pull = profile['cycle'] == 'pull'
+        # simultaneous mode: binds read the states from before any link, pull cycles the states after all binds
+        frozen = self.frozen
+        pulled = None
+        if simultaneous:
+            frozen.update((name, sym.state) for name, sym in symbols.items())
+        for link in self.tick_links:
+            if link.from_symbol in symbols and link.to_symbol in symbols:
+                src = symbols[link.from_symbol]
+                dst = symbols[link.to_symbol]
                 if link.type == 'bind':
-                    delta = src.state * link.weight * self.config['bind_coeff']
+                    # bind transfer
+                    delta = (frozen[src.name] if simultaneous else src.state) * link.weight * self.config['bind_coeff']
+                    old = dst.state
                     dst.state += delta
-                    if abs(delta) > 1e-8:
-                        self.log.append(f'[{self.step_count}] bind transfer {delta:.4f} from {src.name} to {dst.name}')
+                    if events and abs(delta) > 1e-8:
+                        rec.append((step, BIND, index[src.name], index[dst.name], delta, old, dst.state, None))
                 elif link.type == 'cycle':
-                    prev = self.prev_B.get(link.from_symbol, 0.0)
-                    feedback = prev * self.config['cycle_coeff']
+                    prev = prev_B.get(link.from_symbol, 0.0)
+                    if pull:
+                        # soft move of dst toward prev_src
+                        if simultaneous and pulled is None:
+                            pulled = self.pulled
+                            pulled.update((name, sym.state) for name, sym in symbols.items())
+                        diff = prev - (pulled[dst.name] if simultaneous else dst.state)
+                        feedback = diff * self.config['cycle_coeff']
+                    else:
+                        feedback = prev * self.config['cycle_coeff']
                     # apply to target
-                    tgt = self.symbols[link.to_symbol]
-                    old = tgt.state
-                    tgt.state += feedback
-                    if abs(feedback) > 1e-8:
-                        self.log.append(f'[{self.step_count}] cycle feedback {feedback:.4f} from prev {link.from_symbol} to {link.to_symbol} ({old:.4f}->{tgt.state:.4f})')
-
-        # decay towards zero gently
-        for s in self.symbols.values():
+                    old = dst.state
+                    dst.state += feedback
+                    if events and abs(feedback) > 1e-8:
+                        rec.append((step, CYCLE, index[link.from_symbol], index[link.to_symbol], feedback, old, dst.state, None))
+
+        # decay towards zero gently, plus base noise in profiles that have it
+        base = u[self.noise.layout.base] if profile['base_noise'] else None
+        noise_base = self.config.get('noise_base', 0.0)
+        for i, s in enumerate(symbols.values()):
             if isinstance(s.state, float):
                 old = s.state
                 s.state *= self.config['decay_rate']
-                if abs(old - s.state) > 1e-6:
-                    self.log.append(f'[{self.step_count}] decay/noise {s.name} {old:.4f}->{s.state:.4f}')
+                if profile['base_noise']:
+                    s.state += -noise_base + (noise_base + noise_base) * base[i]
+                if events and abs(old - s.state) > 1e-6:
+                    rec.append((step, DECAY, -1, index[s.name], 0.0, old, s.state, None))
 
-        # update previous B values for next tick
-        self.prev_B = {name: sym.state for name, sym in self.symbols.items()}
+        if not profile['prev_at_start']:
+            # update previous B values for next tick
+            prev_B.update((name, sym.state) for name, sym in symbols.items())
+
+        if self.log.level >= LOG_STATES:
+            self.log.end_tick(step, [s.state for s in symbols.values()], rec)
+
+    def sampler(self, record):
+        syms = [self.symbols[name] for name in record]
+        return lambda: [s.state for s in syms]
+
+    def state_vector(self):
+        return np.array([s.state for s in self.symbols.values()])
+
+    def check_stop(self, monitor):
+        if monitor is not None and monitor.update(self.step_count, self.state_vector()):
+            self.log.append(f'[INFO] run stopped at step {self.step_count}: {monitor.regime}')
+            return True
+        return False
+
+    def run(self, steps, record=None, every=1, callback=None, monitor=None):
+        # tick `steps` times and return a (steps // every, len(record)) array sampled after every k-th tick;
+        # callback(engine, row) is called at each sample and may return True to stop early;
+        # monitor (stopping.StopMonitor) ends the run once a fixed point, cycle or divergence is detected
+        record = list(self.symbols) if record is None else list(record)
+        out = np.empty((steps // every, len(record)))
+        sample = self.sampler(record)
+        if monitor is not None:
+            monitor.reset()
+        for i in range(1, steps + 1):
+            self.tick()
+            if i % every == 0:
+                row = i // every - 1
+                out[row] = sample()
+                if callback is not None and callback(self, out[row]):
+                    return out[:row + 1]
+            if self.check_stop(monitor):
+                return out[:i // every]
+        return out
+
+    def iter_run(self, steps, record=None, every=1, chunk=4096, monitor=None):
+        # same sampling as run(), yielded as blocks of at most `chunk` rows so long runs stay in constant memory
+        record = list(self.symbols) if record is None else list(record)
+        sample = self.sampler(record)
+        buf = np.empty((chunk, len(record)))
+        row = 0
+        if monitor is not None:
+            monitor.reset()
+        for i in range(1, steps + 1):
+            self.tick()
+            if i % every == 0:
+                buf[row] = sample()
+                row += 1
+                if row == chunk:
+                    yield buf.copy()
+                    row = 0
+            if self.check_stop(monitor):
+                break
+        if row:
+            yield buf[:row].copy()
+
+    def set_inputs(self, channels):
+        # channels: {symbol: gain} or a list of (symbol, gain) pairs, one input channel each (in order);
+        # drive() adds input * gain to the symbol before every tick. Call again after loading another model.
+        channels = list(channels.items() if isinstance(channels, dict) else channels)
+        for name, gain in channels:
+            if name not in self.symbols:
+                raise ValueError(f'unknown input symbol {name}')
+        self.inputs = [(name, float(gain)) for name, gain in channels]
 
-        self.log.append(f'[{self.step_count}] Tick complete.')
-        if self.symbols:
-            states = ', '.join([f'{s.name}={s.state:.4f}' for s in self.symbols.values()])
-            self.log.append(f'[{self.step_count}] States: {states}')
+    def inject(self, row):
+        for (name, gain), value in zip(self.inputs, row.tolist()):
+            self.symbols[name].state += value * gain
+
+    def drive(self, inputs, record=None):
+        # inputs: (T x channels) array, one row per tick -> (T x len(record)) states after each tick.
+        # An iterator of such chunks (unbounded streams) returns a generator of state chunks instead.
+        if not isinstance(inputs, (np.ndarray, list, tuple)):
+            return self.iter_drive(inputs, record)
+        inputs = np.asarray(inputs, dtype=float).reshape(len(inputs), -1)
+        if inputs.shape[1] != len(self.inputs):
+            raise ValueError(f'{inputs.shape[1]} input columns for {len(self.inputs)} channels')
+        record = list(self.symbols) if record is None else list(record)
+        sample = self.sampler(record)
+        out = np.empty((len(inputs), len(record)))
+        for i, row in enumerate(inputs):
+            self.inject(row)
+            self.tick()
+            out[i] = sample()
+        return out
+
+    def iter_drive(self, chunks, record=None):
+        for chunk in chunks:
+            yield self.drive(np.asarray(chunk), record)
+
+    def rng_state(self):
+        return dict(self.noise.get_state(), kind='numpy')
+
+    def set_rng_state(self, rng):
+        # checkpoints of older unseeded engines hold the random module state, which engines no longer draw from
+        if rng['kind'] == 'numpy':
+            self.noise.set_state(rng)
+
+    def snapshot(self):
+        names = list(self.symbols)
+        prev = np.array([self.prev_B.get(name, 0.0) for name in names])
+        return Snapshot(names, self.state_vector().copy(), prev, self.step_count, self.rng_state())
+
+    def restore(self, snap):
+        if list(snap.names) != list(self.symbols):
+            raise ValueError('snapshot does not match the loaded model')
+        for s, value in zip(self.symbols.values(), snap.state.tolist()):
+            s.state = value
+        self.prev_B = dict(zip(snap.names, snap.prev.tolist()))
+        self.step_count = snap.step_count
+        self.set_rng_state(snap.rng)
+
+    def fork(self, seed=None):
+        # independent engine continuing from the current step; model structure is shared, not copied.
+        # The fork replays the same random draws (a clone of the NoiseStream) unless a new seed is given.
+        other = copy.copy(self)
+        other.symbols = {name: Symbol(name, s.state) for name, s in self.symbols.items()}
+        other.prev_B = dict(self.prev_B)
+        other.frozen = {}
+        other.pulled = {}
+        self.init_fork(other, seed)
+        return other
+
+    def init_fork(self, other, seed):
+        other.config = dict(self.config)
+        other.log = EventLog(self.log.level, self.log.formats)
+        other.log.set_names(self.log.names)
+        if seed is not None:
+            other.noise = NoiseStream(seed)
+            other.configure_noise()
         else:
-            self.log.append(f'[{self.step_count}] States: (none)')
+            other.noise = self.noise.clone()
+
+    def share_noise(self, *others):
+        # common random numbers: from now on the other engines draw exactly the numbers this one draws,
+        # so paired runs (twins, A/B configs) differ only by their state and config. Needs the same
+        # modifier layout.
+        for other in others:
+            if other.noise.layout.cols != self.noise.layout.cols or other.noise.layout.width != self.noise.layout.width:
+                raise ValueError('engines draw different random numbers per tick (other modifiers or symbols)')
+            other.noise = self.noise.clone()
+
+    def save_checkpoint(self, path):
+        self.snapshot().save(path)
+
+    def load_checkpoint(self, path):
+        self.restore(Snapshot.load(path))
 
     def export_log(self, path):
         try:
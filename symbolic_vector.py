@@ -0,0 +1,406 @@
+import json
+import copy
+import random
+import numpy as np
+from collections.abc import Mapping
+from symbolic_core import SymbolicEngine, Modifier, Snapshot, PROFILES
+from noise import sign
+from modifier_rules import compile_modifiers
+from model_format import is_binary, read_arrays, write_arrays, arrays_to_data
+from event_log import LOG_EVENTS, LOG_STATES, BIND as BIND_EVENT, CYCLE as CYCLE_EVENT, DECAY
+
+BIND = 0
+CYCLE = 1
+LINK_TYPES = {'bind': BIND, 'cycle': CYCLE}
+
+
+class LinkStage:
+    # a run of consecutive links that can be applied from one snapshot without changing the result:
+    # in sequential mode no bind reads and no pull cycle targets a symbol written earlier in the run
+    def __init__(self, to_idx, bind_pos, bind_from, bind_weight, cycle_pos, cycle_from):
+        self.to_idx = to_idx
+        self.bind_pos = bind_pos
+        self.bind_from = bind_from
+        self.bind_weight = bind_weight
+        self.cycle_pos = cycle_pos
+        self.cycle_from = cycle_from
+        self.cycle_to = to_idx[cycle_pos]
+
+
+class NameTable(Mapping):
+    # name -> index table built once: names live in one numpy string array and lookups binary-search a
+    # sort order, so a huge model holds no per-symbol str objects and no dict entries.
+    # order: a stored argsort of names (binary model files) to skip the sort
+    def __init__(self, names, order=None):
+        if order is not None:
+            self.names = names
+            self.order = order
+            return
+        names = names if isinstance(names, np.ndarray) else np.array(list(names), dtype=str)
+        width = int(np.char.str_len(names).max()) if len(names) else 1
+        self.names = names.astype(f'U{max(width, 1)}', copy=False)
+        self.order = np.argsort(self.names, kind='stable').astype(np.int32 if len(names) < 2 ** 31 else np.int64)
+
+    def __getitem__(self, name):
+        n = len(self.names)
+        i = int(np.searchsorted(self.names, name, sorter=self.order)) if n else 0
+        if i < n and self.names[self.order[i]] == name:
+            return int(self.order[i])
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(self.names.tolist())
+
+    def __len__(self):
+        return len(self.names)
+
+
+class CompiledModel:
+    # dtype: float64, or float32 to halve state and weight memory (see compact())
+    def __init__(self, names, states, link_from, link_to, link_weight, link_type, modifiers,
+                 dtype=np.float64, index_dtype=np.int64):
+        self.index = names if isinstance(names, NameTable) else NameTable(names)
+        self.names = self.index.names
+        self.states = np.asarray(states, dtype=dtype)
+        self.link_from = np.asarray(link_from, dtype=index_dtype)
+        self.link_to = np.asarray(link_to, dtype=index_dtype)
+        self.link_weight = np.asarray(link_weight, dtype=dtype)
+        self.link_type = np.asarray(link_type, dtype=np.int8)
+        self.modifiers = list(modifiers)
+        self._stages = {}
+
+    @property
+    def dtype(self):
+        return self.states.dtype
+
+    def compact(self, dtype=np.float32):
+        # float32 states and weights, int32 link indices when they fit; the name table is shared
+        index_dtype = np.int32 if self.n_symbols < 2 ** 31 else np.int64
+        return CompiledModel(self.index, self.states, self.link_from, self.link_to, self.link_weight,
+                             self.link_type, self.modifiers, dtype, index_dtype)
+
+    def link_stages(self, profile='core', propagation='sequential'):
+        # built on first use per (profile, propagation): the sparse backend only needs them in sequential mode
+        key = (profile, propagation)
+        if key not in self._stages:
+            p = PROFILES[profile]
+            arrays = (self.link_from, self.link_to, self.link_weight, self.link_type)
+            if p['binds_first']:
+                order = np.concatenate([np.flatnonzero(self.link_type == BIND), np.flatnonzero(self.link_type == CYCLE)])
+                arrays = [a[order] for a in arrays]
+            self._stages[key] = build_stages(*arrays, p['cycle'] == 'pull', propagation == 'simultaneous')
+        return self._stages[key]
+
+    @property
+    def n_symbols(self):
+        return len(self.names)
+
+    @property
+    def n_links(self):
+        return len(self.link_from)
+
+    def arrays(self):
+        # flat arrays of the binary model format (model_format.py)
+        rules = [m.rule for m in self.modifiers]
+        return {'names': self.names, 'name_order': self.index.order, 'states': self.states,
+                'link_from': self.link_from, 'link_to': self.link_to, 'link_weight': self.link_weight,
+                'link_type': self.link_type,
+                'mod_target': np.array([self.index[m.target] for m in self.modifiers], dtype=np.int64),
+                'mod_rule': np.array(rules, dtype=str) if rules else np.zeros(0, dtype='U1')}
+
+    def to_data(self):
+        # JSON model schema, for loading into the reference engine
+        return arrays_to_data(self.arrays())
+
+
+def build_stages(link_from, link_to, link_weight, link_type, pull=False, simultaneous=False):
+    stages = []
+    start = 0
+    written = set()
+    bounds = []
+    if simultaneous:
+        # every bind reads the pre-link state; pull cycles read the state after all binds
+        split = int(np.argmax(link_type == CYCLE)) if pull and (link_type == CYCLE).any() else len(link_from)
+        bounds = [(a, b) for a, b in ((0, split), (split, len(link_from))) if b > a]
+    else:
+        for k in range(len(link_from)):
+            if (link_type[k] == BIND and int(link_from[k]) in written) or \
+                    (pull and link_type[k] == CYCLE and int(link_to[k]) in written):
+                bounds.append((start, k))
+                start = k
+                written = set()
+            written.add(int(link_to[k]))
+        if start < len(link_from):
+            bounds.append((start, len(link_from)))
+    for a, b in bounds:
+        types = link_type[a:b]
+        bind_pos = np.flatnonzero(types == BIND)
+        cycle_pos = np.flatnonzero(types == CYCLE)
+        stages.append(LinkStage(link_to[a:b].copy(),
+                                bind_pos, link_from[a:b][bind_pos], link_weight[a:b][bind_pos],
+                                cycle_pos, link_from[a:b][cycle_pos]))
+    return stages
+
+
+def compile_model(data):
+    # same filtering as SymbolicEngine.load_model; links and modifiers that would be no-ops are dropped
+    symbols = {s['name']: float(s['state']) for s in data.get('symbols', []) if 'name' in s and 'state' in s}
+    names = list(symbols.keys())
+    index = {name: i for i, name in enumerate(names)}
+    link_from, link_to, link_weight, link_type = [], [], [], []
+    for l in data.get('links', []):
+        if all(k in l for k in ('from', 'to', 'weight', 'type')):
+            if l['from'] in index and l['to'] in index and l['type'] in LINK_TYPES:
+                link_from.append(index[l['from']])
+                link_to.append(index[l['to']])
+                link_weight.append(l['weight'])
+                link_type.append(LINK_TYPES[l['type']])
+    modifiers = []
+    for m in data.get('modifiers', []):
+        if 'target' in m and 'rule' in m and m['target'] in index:
+            modifiers.append(Modifier(m['target'], m['rule']))
+    return CompiledModel(names, [symbols[n] for n in names], link_from, link_to, link_weight, link_type, modifiers)
+
+
+def read_model(filepath, mmap=True):
+    # JSON file, or a binary model (.npz archive or directory of .npy files, see model_format.py)
+    if is_binary(filepath):
+        return read_binary(filepath, mmap)
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return compile_model(data)
+
+
+def read_binary(path, mmap=True):
+    # link arrays of a .npy directory stay memory-mapped; engines copy only the state vector
+    a = read_arrays(path, mmap)
+    names = a['names']
+    modifiers = [Modifier(str(names[t]), r) for t, r in zip(a['mod_target'].tolist(), a['mod_rule'].tolist())]
+    return CompiledModel(NameTable(names, a['name_order']), a['states'], a['link_from'], a['link_to'],
+                         a['link_weight'], a['link_type'], modifiers, a['states'].dtype, a['link_from'].dtype)
+
+
+def save_binary(model, path, compress=False):
+    write_arrays(path, model.arrays(), compress)
+
+
+def json_to_binary(json_path, path, compress=False):
+    save_binary(read_model(json_path), path, compress)
+
+
+def binary_to_json(path, json_path):
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(read_binary(path).to_data(), f, indent=2)
+
+
+class SymbolView:
+    # Symbol-compatible handle onto one slot of the engine state vector
+    __slots__ = ('name', '_engine', '_idx')
+
+    def __init__(self, engine, name, idx):
+        self.name = name
+        self._engine = engine
+        self._idx = idx
+
+    @property
+    def state(self):
+        return float(self._engine.state[self._idx])
+
+    @state.setter
+    def state(self, value):
+        self._engine.state[self._idx] = value
+
+    def invert(self, u=None, choices=(-1.0, 1.0)):
+        if self.state == 0.0:
+            self.state = random.choice(choices) if u is None else sign(u)
+        else:
+            self.state = -self.state
+
+
+class SymbolMap(Mapping):
+    # name -> SymbolView, created on access so huge models do not hold one object per symbol
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __getitem__(self, name):
+        return SymbolView(self.engine, name, self.engine.index[name])
+
+    def __contains__(self, name):
+        return name in self.engine.index
+
+    def __iter__(self):
+        return iter(self.engine.model.index)
+
+    def __len__(self):
+        return len(self.engine.model.names)
+
+
+class VectorEngine(SymbolicEngine):
+    # Array-backed drop-in for SymbolicEngine. Bind/cycle/decay run as whole-array operations,
+    # results match the object engine bit for bit under the same seed, profile and propagation mode.
+    # Random numbers always come from a NoiseStream (seed=None seeds it from OS entropy).
+    # At LOG_EVENTS the per-link lines are reconstructed in a slow path; use LOG_STATES or LOG_OFF for speed.
+    # dtype=np.float32 halves state memory (default: the compiled model's dtype). state and prev are allocated
+    # once per model and overwritten in place every tick.
+    def __init__(self, config=None, log_level=LOG_EVENTS, seed=None, profile='core', propagation='sequential', dtype=None):
+        super().__init__(config, log_level, seed, profile, propagation)
+        self.dtype = dtype
+        self.model = None
+        self.stages = []
+        self.state = np.zeros(0)
+        self.prev = np.zeros(0)
+        self.scratch = np.zeros(0)
+        self.link_delta = np.zeros(0)
+        self.input_idx = np.zeros(0, dtype=np.int64)
+        self.input_gain = np.zeros(0)
+        # set to an array of ones to collect each tick's modifier slopes d x / d x (lyapunov.py)
+        self.slopes = None
+
+    def load_model(self, filepath):
+        from model_cache import load_cached
+        try:
+            model = load_cached(filepath)
+        except Exception as e:
+            self.log.append(f'[ERROR] loading model: {e}')
+            return
+        self.load_compiled(model)
+        self.log.append(f'[INFO] Model {filepath} loaded: symbols={self.model.n_symbols}, modifiers={[m.rule for m in self.modifiers]}, links={self.model.n_links}')
+
+    def load_compiled(self, model):
+        self.model = model
+        self.state = model.states.astype(self.dtype or model.dtype)
+        self.prev = self.state.copy()
+        self.scratch = np.zeros(model.n_symbols if self.profile['base_noise'] else 0)
+        self.symbols = SymbolMap(self)
+        self.index = model.index
+        self.log.set_names(model.names)
+        self.links = []
+        self.modifiers = list(model.modifiers)
+        self.configure_noise()
+        self.mod_stages, unknown = compile_modifiers(self.modifiers, self.index, self.noise.layout, self.profile['rules'])
+        self.stages = self.compile_links(model)
+        # per-engine scratch for the link deltas of a stage; the stages are shared between engines
+        self.link_delta = np.empty(max((len(s.to_idx) for s in self.stages), default=0), dtype=model.link_weight.dtype)
+        for m in unknown:
+            self.log.append(f'[INFO] unknown modifier {m.rule} on {m.target} ignored')
+
+    def compile_links(self, model):
+        return model.link_stages(self.profile_name, self.propagation)
+
+    def apply_modifiers(self, u):
+        # one masked array operation per rule group; events are re-sorted into modifier order for the log
+        events = [] if self.log.level >= LOG_EVENTS else None
+        if self.slopes is not None:
+            self.slopes.fill(1.0)
+        for stage in self.mod_stages:
+            for group in stage:
+                x = self.state[group.idx]
+                new, fired, value = group.rule.kernel(x, u[group.cols], self.config)
+                self.state[group.idx] = new
+                if self.slopes is not None:
+                    self.slopes[group.idx] *= group.rule.derivative(x, u[group.cols], self.config, new, fired)
+                if events is not None and group.rule.kind is not None:
+                    value = np.zeros(len(x)) if value is None else value
+                    events.append((group.pos[fired], group.rule.kind, group.idx[fired], value[fired], x[fired], new[fired]))
+        if events:
+            pos, kind, dst, value, old, new = [np.concatenate([np.broadcast_to(e[i], e[0].shape) for e in events])
+                                               for i in range(6)]
+            order = np.argsort(pos, kind='stable')
+            for i in order.tolist():
+                self.log.event(self.step_count, int(kind[i]), dst=int(dst[i]), value=float(value[i]),
+                               old=float(old[i]), new=float(new[i]))
+
+    def set_inputs(self, channels):
+        super().set_inputs(channels)
+        self.input_idx = np.array([self.index[name] for name, gain in self.inputs], dtype=np.int64)
+        self.input_gain = np.array([gain for name, gain in self.inputs])
+
+    def inject(self, row):
+        # channels feeding the same symbol accumulate in channel order, as in the object engine
+        np.add.at(self.state, self.input_idx, row * self.input_gain)
+
+    def sampler(self, record):
+        idx = np.array([self.index[name] for name in record], dtype=np.int64)
+        return lambda: self.state[idx]
+
+    def snapshot(self):
+        return Snapshot(self.model.names, self.state.copy(), self.prev.copy(), self.step_count, self.rng_state())
+
+    def restore(self, snap):
+        if not np.array_equal(snap.names, self.model.names):
+            raise ValueError('snapshot does not match the loaded model')
+        self.state[:] = snap.state
+        self.prev[:] = snap.prev
+        self.step_count = snap.step_count
+        self.set_rng_state(snap.rng)
+
+    def fork(self, seed=None):
+        # compiled model, link stages and modifier groups are shared; state, prev, scratch, RNG and log are copied
+        other = copy.copy(self)
+        other.state = self.state.copy()
+        other.prev = self.prev.copy()
+        other.scratch = self.scratch.copy()
+        other.link_delta = np.empty_like(self.link_delta)
+        other.slopes = None if self.slopes is None else self.slopes.copy()
+        other.symbols = SymbolMap(other)
+        self.init_fork(other, seed)
+        return other
+
+    def state_vector(self):
+        return self.state
+
+    def propagate(self):
+        bind_coeff = self.config['bind_coeff']
+        cycle_coeff = self.config['cycle_coeff']
+        pull = self.profile['cycle'] == 'pull'
+        state = self.state
+        for stage in self.stages:
+            delta = self.link_delta[:len(stage.to_idx)]
+            delta[stage.bind_pos] = state[stage.bind_from] * stage.bind_weight * bind_coeff
+            if pull:
+                delta[stage.cycle_pos] = (self.prev[stage.cycle_from] - state[stage.cycle_to]) * cycle_coeff
+            else:
+                delta[stage.cycle_pos] = self.prev[stage.cycle_from] * cycle_coeff
+            # ufunc.at accumulates in link order, matching the sequential loop exactly
+            if self.log.level >= LOG_EVENTS:
+                self.log_stage(stage, delta)
+            np.add.at(state, stage.to_idx, delta)
+
+    def log_stage(self, stage, delta):
+        # replay the stage link by link (before it is applied) to recover the historic event lines
+        kinds = np.full(len(stage.to_idx), BIND_EVENT)
+        kinds[stage.cycle_pos] = CYCLE_EVENT
+        src = np.empty(len(stage.to_idx), dtype=np.int64)
+        src[stage.bind_pos] = stage.bind_from
+        src[stage.cycle_pos] = stage.cycle_from
+        running = {}
+        for kind, s, t, d in zip(kinds.tolist(), src.tolist(), stage.to_idx.tolist(), delta.tolist()):
+            old = running.get(t, float(self.state[t]))
+            running[t] = old + d
+            if abs(d) > 1e-8:
+                self.log.event(self.step_count, kind, s, t, d, old, old + d)
+
+    def tick(self):
+        self.step_count += 1
+        profile = self.profile
+        if profile['prev_at_start']:
+            np.copyto(self.prev, self.state)
+        u = self.noise.next()
+        self.apply_modifiers(u)
+        if self.model is not None:
+            self.propagate()
+            old = self.state.copy() if self.log.level >= LOG_EVENTS else None
+            self.state *= self.config['decay_rate']
+            if profile['base_noise']:
+                nb = self.config['noise_base']
+                base = np.multiply(u[self.noise.layout.base], nb + nb, out=self.scratch)
+                base -= nb
+                self.state += base
+            if old is not None:
+                changed = np.flatnonzero(np.abs(old - self.state) > 1e-6)
+                self.log.events(self.step_count, DECAY, -1, changed, 0.0, old[changed], self.state[changed])
+            if not profile['prev_at_start']:
+                np.copyto(self.prev, self.state)
+
+        if self.log.level >= LOG_STATES:
+            self.log.end_tick(self.step_count, self.state)
@@ -16,19 +16,10 @@ def main():
     engine.load_model('model_v04.json')
     T = 200
     signal = generate_signal(T)
-    reservoir_states = []
-    targets = []
-
-    for i in range(T-1):
-        # feed signal as background_noise modifier: add to A manually
-        # emulate external input by adding to symbol A
-        engine.symbols['A'].state += signal[i] * 0.01  # small injection
-        engine.tick()
-        reservoir_states.append([engine.symbols['A'].state, engine.symbols['B'].state])
-        targets.append(signal[i+1])  # predict next value
-
-    X = np.array(reservoir_states)
-    y = np.array(targets)
+    # external input channel: signal added to symbol A before every tick (small injection)
+    engine.set_inputs({'A': 0.01})
+    X = engine.drive(signal[:T-1, None], record=['A', 'B'])
+    y = signal[1:]  # predict next value
 
     # train linear readout
     model = Ridge(alpha=1.0)
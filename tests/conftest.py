@@ -0,0 +1,16 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# the modules live flat in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+MODEL = os.path.join(ROOT, 'model_v04.json')
+
+# compiled models and fitted bases go to a throwaway cache, not ~/.cache/symbolic_physics; set before
+# model_cache is imported (it reads the variable once), inherited by scan worker processes
+CACHE = tempfile.mkdtemp(prefix='symbolic-cache-')
+os.environ['SYMBOLIC_MODEL_CACHE'] = CACHE
+atexit.register(shutil.rmtree, CACHE, ignore_errors=True)
@@ -0,0 +1,40 @@
+import numpy as np
+from conftest import MODEL
+from symbolic_core import LOG_OFF
+from symbolic_vector import VectorEngine
+from accumulators import Welford, MinMax, MetricSet
+
+
+def test_streaming_stats_over_uneven_chunks():
+    rng = np.random.default_rng(0)
+    # (ticks, replicas, symbols), offset far from zero so a naive sum-of-squares variance would lose digits
+    data = 1e6 + rng.standard_normal((1000, 3, 4)) * np.array([1e-3, 1.0, 10.0, 1e3])
+    welford = Welford(['b', 'd'])
+    minmax = MinMax()
+    for acc in (welford, minmax):
+        acc.bind(['a', 'b', 'c', 'd'], {'a': 0, 'b': 1, 'c': 2, 'd': 3})
+    for block in np.split(data, [1, 2, 50, 51, 400, 999]):
+        for x in block:
+            welford.update(x)
+            minmax.update(x)
+    stats = welford.result()
+    assert welford.count == 1000
+    assert np.allclose(stats['mean'], data[..., [1, 3]].mean(axis=0), rtol=1e-14)
+    assert np.allclose(stats['var'], data[..., [1, 3]].var(axis=0), rtol=1e-8)
+    assert np.allclose(stats['std'], data[..., [1, 3]].std(axis=0), rtol=1e-8)
+    assert np.array_equal(minmax.result()['min'], data.min(axis=0))
+    assert np.array_equal(minmax.result()['max'], data.max(axis=0))
+
+
+def test_metric_set_matches_trajectory():
+    engine = VectorEngine(log_level=LOG_OFF, seed=4)
+    engine.load_model(MODEL)
+    fork = engine.fork()
+    metrics = MetricSet(Welford(), MinMax(['B']))
+    engine.run(500, record=[], callback=metrics)
+    traj = fork.run(500)
+    report = metrics.report()
+    assert np.allclose(report['welford']['mean'], traj.mean(axis=0), rtol=1e-12, atol=1e-15)
+    assert np.allclose(report['welford']['var'], traj.var(axis=0), rtol=1e-10, atol=1e-15)
+    assert report['minmax']['symbols'] == ['B']
+    assert report['minmax']['min'][0] == traj[:, 1].min() and report['minmax']['max'][0] == traj[:, 1].max()
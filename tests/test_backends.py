@@ -0,0 +1,47 @@
+import os
+import pytest
+from conftest import MODEL, ROOT, CACHE
+from symbolic_core import SymbolicEngine, PROFILES, PROPAGATION_MODES, LOG_OFF, LOG_EVENTS
+from symbolic_sparse import SparseEngine
+from backends import BACKENDS, compare_backends
+import symbolic_engine
+import model_cache
+
+
+@pytest.mark.parametrize('model', [MODEL, os.path.join(ROOT, 'random_net.json')])
+@pytest.mark.parametrize('profile', list(PROFILES))
+@pytest.mark.parametrize('propagation', PROPAGATION_MODES)
+def test_backends_match_reference(model, profile, propagation):
+    report = compare_backends(model, profile, propagation, steps=100)
+    assert set(report) == (set(BACKENDS) - {'reference'}) | {'ensemble'}
+
+
+@pytest.mark.parametrize('name', list(BACKENDS))
+def test_backend_signatures(name):
+    # every backend takes (config, log_level, seed, profile, propagation) in the same order
+    engine = BACKENDS[name](None, LOG_OFF, 7, 'engine', 'simultaneous')
+    assert (engine.profile_name, engine.propagation, engine.log.level) == ('engine', 'simultaneous', LOG_OFF)
+
+
+def test_engine_wrapper_signature():
+    # the compatibility wrapper takes the same positional arguments, with the 'engine' profile by default
+    engine = symbolic_engine.SymbolicEngine({'decay_rate': 0.5}, LOG_OFF, 7)
+    assert (engine.decay_rate, engine.profile_name, engine.log.level) == (0.5, 'engine', LOG_OFF)
+
+
+@pytest.mark.parametrize('model', [MODEL, os.path.join(ROOT, 'random_net.json')])
+@pytest.mark.parametrize('profile', list(PROFILES))
+def test_sparse_simultaneous_events_match_reference(model, profile):
+    logs = []
+    for cls in (SymbolicEngine, SparseEngine):
+        engine = cls(log_level=LOG_EVENTS, seed=3, profile=profile, propagation='simultaneous')
+        engine.load_model(model)
+        engine.run(30)
+        # past the load message, whose summary differs between backends
+        logs.append(list(engine.log)[1:])
+    assert logs[0] == logs[1]
+    assert engine.stages == []
+
+
+def test_tests_use_a_temporary_model_cache():
+    assert model_cache.default_cache.directory == CACHE
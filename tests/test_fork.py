@@ -0,0 +1,46 @@
+import random
+import numpy as np
+import pytest
+from conftest import MODEL
+from symbolic_core import SymbolicEngine, LOG_OFF
+from symbolic_vector import VectorEngine
+
+
+@pytest.mark.parametrize('cls', [SymbolicEngine, VectorEngine])
+@pytest.mark.parametrize('profile', ['core', 'engine'])
+def test_unseeded_fork_replays(cls, profile):
+    engine = cls(log_level=LOG_OFF, profile=profile)
+    engine.load_model(MODEL)
+    engine.run(10)
+    other = engine.fork()
+    random.random()
+    assert np.array_equal(engine.run(50), other.run(50))
+
+
+def test_unseeded_restore_keeps_global_random():
+    engine = SymbolicEngine(log_level=LOG_OFF)
+    engine.load_model(MODEL)
+    snap = engine.snapshot()
+    first = engine.run(30)
+    random.seed(7)
+    expected = random.random()
+    random.seed(7)
+    engine.restore(snap)
+    assert random.random() == expected
+    assert np.array_equal(engine.run(30), first)
+
+
+def test_shared_model_engines_keep_own_scratch():
+    # engines on one cached model share its link stages; interleaved ticks must not mix their link deltas
+    engines = [VectorEngine(log_level=LOG_OFF, seed=s, propagation='simultaneous') for s in (1, 2)]
+    for engine in engines:
+        engine.load_model(MODEL)
+    engines.append(engines[0].fork(seed=3))
+    assert engines[0].stages is engines[1].stages
+    assert engines[0].link_delta is not engines[1].link_delta
+    assert engines[0].link_delta is not engines[2].link_delta
+    alone = [engine.fork().run(20) for engine in engines]
+    together = [engine.iter_run(20, chunk=1) for engine in engines]
+    for step in range(20):
+        for engine, traj, blocks in zip(engines, alone, together):
+            assert np.array_equal(next(blocks)[0], traj[step])
@@ -0,0 +1,54 @@
+import json
+import math
+import numpy as np
+from conftest import MODEL, ROOT
+from symbolic_core import LOG_OFF
+from symbolic_vector import VectorEngine
+from lyapunov import lyapunov_spectrum, twin_lyapunov
+
+# no modifiers: one tick is a linear map of the state
+LINEAR = {'symbols': [{'name': 'A', 'state': 1.0}, {'name': 'B', 'state': 0.5}, {'name': 'C', 'state': -0.3}],
+          'links': [{'from': 'A', 'to': 'B', 'weight': 0.8, 'type': 'bind'},
+                    {'from': 'B', 'to': 'C', 'weight': -0.5, 'type': 'bind'},
+                    {'from': 'C', 'to': 'A', 'weight': 0.6, 'type': 'bind'},
+                    {'from': 'C', 'to': 'B', 'weight': 1.0, 'type': 'cycle'}]}
+
+
+def linear_model(tmp_path):
+    path = tmp_path / 'linear.json'
+    path.write_text(json.dumps(LINEAR))
+    return str(path)
+
+
+def tick_matrix(model_file):
+    # columns: one tick applied to each unit state (core profile: prev is the state at the start of a tick)
+    engine = VectorEngine(log_level=LOG_OFF, seed=0)
+    engine.load_model(model_file)
+    n = engine.model.n_symbols
+    J = np.empty((n, n))
+    for i in range(n):
+        engine.state[:] = np.eye(n)[i]
+        engine.prev[:] = engine.state
+        engine.tick()
+        J[:, i] = engine.state
+    return J
+
+
+def test_spectrum_of_linear_model(tmp_path):
+    model = linear_model(tmp_path)
+    expected = np.sort(np.log(np.abs(np.linalg.eigvals(tick_matrix(model)))))[::-1]
+    result = lyapunov_spectrum(model, steps=3000, transient=0, seed=0)
+    assert np.allclose(result['exponents'], expected, atol=5e-3)
+
+
+def test_tangent_and_twin_agree(tmp_path):
+    model = linear_model(tmp_path)
+    tangent = lyapunov_spectrum(model, 1, 3000, transient=0, seed=0)['exponents'][0]
+    assert abs(twin_lyapunov(model, 3000, seed=0) - tangent) < 5e-3
+    # random modifiers: both follow the same draws
+    tangent = lyapunov_spectrum(MODEL, 1, 2000, transient=0, seed=1)['exponents'][0]
+    assert abs(twin_lyapunov(MODEL, 2000, seed=1) - tangent) < 2e-2
+
+
+def test_twin_reports_divergence():
+    assert twin_lyapunov(f'{ROOT}/random_net.json', 5000, seed=1) == math.inf
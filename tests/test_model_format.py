@@ -0,0 +1,43 @@
+import os
+from pathlib import Path
+import numpy as np
+from conftest import MODEL
+from symbolic_core import SymbolicEngine, LOG_OFF
+from symbolic_vector import VectorEngine, read_model, save_binary
+from model_cache import ModelCache
+
+
+def test_load_model_from_path():
+    ref = SymbolicEngine(log_level=LOG_OFF, seed=1)
+    ref.load_model(MODEL)
+    engine = SymbolicEngine(log_level=LOG_OFF, seed=1)
+    engine.load_model(Path(MODEL))
+    assert list(engine.symbols) == list(ref.symbols)
+    assert np.array_equal(engine.run(20), ref.run(20))
+
+
+def test_binary_model_from_path(tmp_path):
+    model = read_model(Path(MODEL))
+    for target in (tmp_path / 'model.npz', tmp_path / 'model_dir'):
+        save_binary(model, target)
+        engine = VectorEngine(log_level=LOG_OFF, seed=2)
+        engine.load_model(target)
+        ref = VectorEngine(log_level=LOG_OFF, seed=2)
+        ref.load_model(MODEL)
+        assert np.array_equal(engine.run(20), ref.run(20))
+
+
+def test_model_cache_accepts_path(tmp_path):
+    cache = ModelCache(directory=str(tmp_path))
+    model = cache.load(Path(MODEL))
+    assert list(model.names) == list(read_model(MODEL).names)
+
+
+def test_model_cache_evicts_pca_bases(tmp_path):
+    basis = tmp_path / 'pca-old.npz'
+    np.savez(basis, mean=np.zeros(1000))
+    os.utime(basis, (0, 0))
+    cache = ModelCache(directory=str(tmp_path), max_bytes=1)
+    assert [path for mtime, size, path in cache.disk_entries()] == [str(basis)]
+    cache.load(MODEL)
+    assert not basis.exists()
@@ -0,0 +1,21 @@
+import json
+import pytest
+from symbolic_core import SymbolicEngine, LOG_EVENTS
+from symbolic_vector import VectorEngine
+
+DATA = {'symbols': [{'name': 'A', 'state': 0.5}, {'name': 'B', 'state': -0.2}],
+        'links': [{'from': 'A', 'to': 'B', 'weight': 1.0, 'type': 'bind'}],
+        'modifiers': [{'target': 'A', 'rule': 'melt'}, {'target': 'B', 'rule': 'threshold_invert'},
+                      {'target': 'B', 'rule': 'invert'}]}
+
+
+@pytest.mark.parametrize('cls', [SymbolicEngine, VectorEngine])
+def test_unknown_modifiers_reported_once(cls, tmp_path):
+    path = tmp_path / 'model.json'
+    path.write_text(json.dumps(DATA))
+    engine = cls(log_level=LOG_EVENTS, seed=0)
+    engine.load_model(str(path))
+    engine.run(5)
+    unknown = [line for line in engine.log if 'unknown modifier' in line]
+    assert unknown == ['[INFO] unknown modifier melt on A ignored',
+                       '[INFO] unknown modifier threshold_invert on B ignored']
@@ -0,0 +1,34 @@
+from conftest import MODEL
+from param_scan import run_parallel_scan
+from adaptive_scan import run_adaptive_scan
+from lyapunov import lyapunov_map
+from result_store import ResultStore
+
+AXES = {'decay_rate': [0.9, 0.95], 'bind_coeff': [0.1, 0.2]}
+
+
+def test_scan_summary_counts_store_hits(tmp_path, capsys):
+    store = str(tmp_path / 'results.db')
+    run_parallel_scan(MODEL, AXES, str(tmp_path / 'a.csv'), steps=20, seed=1, workers=1, store=store)
+    assert '4 points: 4 simulated, 0 from the store, 0 already in the CSV' in capsys.readouterr().out
+    run_parallel_scan(MODEL, AXES, str(tmp_path / 'b.csv'), steps=20, seed=1, workers=1, store=store)
+    assert '4 points: 0 simulated, 4 from the store, 0 already in the CSV' in capsys.readouterr().out
+    run_parallel_scan(MODEL, AXES, str(tmp_path / 'b.csv'), steps=20, seed=1, workers=1, store=store)
+    assert '4 points: 0 simulated, 0 from the store, 4 already in the CSV' in capsys.readouterr().out
+
+
+def test_scans_close_the_stores_they_open(tmp_path, monkeypatch):
+    closed = []
+    close = ResultStore.close
+    monkeypatch.setattr(ResultStore, 'close', lambda self: closed.append(self.path) or close(self))
+    path = str(tmp_path / 'results.db')
+    run_parallel_scan(MODEL, AXES, str(tmp_path / 'a.csv'), steps=20, seed=1, workers=1, store=path)
+    run_adaptive_scan(MODEL, {'decay_rate': (0.9, 1.0)}, str(tmp_path / 'b.csv'), initial=4, rounds=1, per_round=2,
+                      steps=20, seed=1, store=path)
+    lyapunov_map(MODEL, AXES, str(tmp_path / 'c.csv'), steps=20, seed=1, workers=1, transient=0, blocks=2, store=path)
+    assert closed == [path] * 3
+    # a store passed in stays open for the caller
+    with ResultStore(path) as store:
+        run_parallel_scan(MODEL, AXES, str(tmp_path / 'd.csv'), steps=20, seed=1, workers=1, store=store)
+        assert store.count('lyapunov_map') == 4
+    assert closed == [path] * 4
@@ -0,0 +1,21 @@
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from phase_visualizer import SeriesEnvelope, PhaseDensity, LIMIT
+
+
+def test_envelope_skips_diverging_values(tmp_path):
+    envelope = SeriesEnvelope(columns=4)
+    envelope.update(np.column_stack([np.linspace(0, 1, 20), np.linspace(0, -1, 20)]))
+    diverging = np.column_stack([np.geomspace(1.0, 1e308, 30), -np.geomspace(1.0, 1e308, 30)])
+    diverging[-5:] = [np.inf, np.nan]
+    envelope.update(diverging)
+    t, lo, hi = envelope.envelope()
+    finite = lo[np.isfinite(lo)]
+    assert envelope.count == 50 and envelope.outside == 10
+    assert (np.abs(finite) < LIMIT).all() and np.isfinite(hi[:2]).all()
+    envelope.render(str(tmp_path / 'series.png'), ['x', 'y'])
+    density = PhaseDensity(bins=16)
+    density.update(diverging[:, 0], diverging[:, 1])
+    density.render(str(tmp_path / 'phase.png'))
+    assert (tmp_path / 'series.png').exists() and (tmp_path / 'phase.png').exists()
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+from conftest import MODEL
+from symbolic_core import SymbolicEngine, LOG_STATES, LOG_EVENTS
+from symbolic_vector import VectorEngine, compile_model
+from event_log import EventLog
+from sinks import TextSink, TrajectorySink, parts, read_trajectory
+
+N = 500
+BUDGET = 1 << 15
+
+
+def wide_engine():
+    # N symbols, 16 state rows per log flush
+    data = {'symbols': [{'name': f'S{i}', 'state': 1.0} for i in range(N)],
+            'links': [{'from': f'S{i}', 'to': f'S{(i + 1) % N}', 'weight': 0.1, 'type': 'bind'} for i in range(N)]}
+    engine = VectorEngine(log_level=LOG_STATES, seed=0)
+    engine.log = EventLog(LOG_STATES, engine.profile['formats'], state_budget=16 * N)
+    engine.load_compiled(compile_model(data))
+    return engine
+
+
+class WatchedSink(TrajectorySink):
+    peak = 0
+
+    def flush(self):
+        super().flush()
+        self.peak = max(self.peak, self.queued_bytes)
+
+
+def test_trajectory_sink_streams_within_budget(tmp_path):
+    path = str(tmp_path / 'traj.bin')
+    engine = wide_engine()
+    sink = TrajectorySink(path, batch_bytes=BUDGET, chunk_bytes=BUDGET, background=False)
+    engine.log.attach(sink)
+    expected = engine.run(300)
+    # written while the run goes on: the sink holds at most a batch and a chunk
+    held = sink.pending_bytes + len(sink.rows) * N * 8
+    assert held <= 2 * BUDGET + 16 * N * 8
+    sink.file.flush()
+    assert os.path.getsize(path) >= (300 * N * 8) - held - 16 * N * 8
+    engine.log.detach()
+    names, steps, states = read_trajectory(path)
+    assert steps.tolist() == list(range(1, 301))
+    assert np.array_equal(states, expected)
+
+
+def test_background_queue_bounded_by_bytes(tmp_path):
+    engine = wide_engine()
+    sink = WatchedSink(str(tmp_path / 'traj.bin'), batch_bytes=BUDGET, queue_bytes=4 * BUDGET, chunk_bytes=BUDGET)
+    engine.log.attach(sink)
+    engine.run(300)
+    engine.log.detach()
+    assert 0 < sink.peak <= 4 * BUDGET
+    assert len(read_trajectory(sink.path)[1]) == 300
+
+
+def test_text_sink_rotates_by_size(tmp_path):
+    path = str(tmp_path / 'run.log')
+    engine = SymbolicEngine(log_level=LOG_EVENTS, seed=1)
+    engine.load_model(MODEL)
+    engine.log.attach(TextSink(path, max_bytes=20000))
+    engine.run(1000)
+    engine.log.detach()
+    files = parts(path)
+    assert len(files) > 5
+    # each part stops at the first check past max_bytes: at most TextSink.lines lines over
+    assert all(20000 <= os.path.getsize(f) < 20000 + 64 * 200 for f in files[:-1])
+    text = ''.join(open(f, encoding='utf-8').read() for f in files)
+    # everything logged after attach (the load message came before)
+    assert text == ''.join(line + '\n' for line in list(engine.log)[1:])
+
+
+def test_trajectory_sink_rotates_by_size(tmp_path):
+    path = str(tmp_path / 'traj.bin')
+    engine = wide_engine()
+    sink = TrajectorySink(path, max_bytes=10 * N * 8)
+    engine.log.attach(sink)
+    expected = engine.run(100)
+    engine.log.detach()
+    files = parts(path)
+    assert len(files) >= 10
+    assert all(os.path.getsize(f) < 10 * N * 8 + 2 * N * 8 + 64 * N for f in files)
+    names, steps, states = read_trajectory(path)
+    assert np.array_equal(states, expected)
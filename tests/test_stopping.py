@@ -0,0 +1,28 @@
+import numpy as np
+from stopping import StopMonitor, FIXED_POINT, PERIODIC, DIVERGED
+
+
+def watch(monitor, states):
+    for step, x in enumerate(states, 1):
+        if monitor.update(step, x):
+            return step
+    return None
+
+
+def test_slow_decay_is_not_stopped_early():
+    # successive states share a period_tol cell long before the changes fall below tol
+    monitor = StopMonitor()
+    states = (np.array([1.0, -1.0]) * 0.999 ** t for t in range(40000))
+    step = watch(monitor, states)
+    assert monitor.regime == FIXED_POINT
+    assert 0.999 ** step * 1e-3 < monitor.tol
+
+
+def test_cycle_and_divergence():
+    monitor = StopMonitor()
+    cycle = np.array([[0.5, 0.1], [-0.2, 0.3], [0.7, -0.4]])
+    assert watch(monitor, (cycle[t % 3] for t in range(50))) == 4
+    assert (monitor.regime, monitor.period) == (PERIODIC, 3)
+    monitor = StopMonitor(max_norm=1e3)
+    watch(monitor, (np.array([2.0 ** t]) for t in range(50)))
+    assert (monitor.regime, monitor.step) == (DIVERGED, 11)